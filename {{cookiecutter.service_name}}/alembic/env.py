@@ -44,6 +44,18 @@ def _get_db_uri() -> str:
     return service_config.database_dsn
 
 
+def _get_shard_db_uris() -> list[str]:
+    """Return URIs of all database shards.
+
+    Every shard has the same schema, so migrations are applied to each one.
+
+    Returns:
+        Connection URIs of the shards, starting with the first one.
+    """
+    service_config = svc_cfg.Config()
+    return [service_config.database_dsn, *service_config.database_shard_dsns]
+
+
 def run_migrations_offline() -> None:
     """Run migrations in 'offline' mode.
 
@@ -53,7 +65,7 @@ def run_migrations_offline() -> None:
     we don't even need a DBAPI to be available.
 
     Calls to context.execute() here emit the given string to the
-    script output.
+    script output. The script applies to every database shard.
 
     """
     db_uri = _get_db_uri()
@@ -72,17 +84,18 @@ def run_migrations_online() -> None:
     """Run migrations in 'online' mode.
 
     In this scenario we need to create an Engine
-    and associate a connection with the context.
+    and associate a connection with the context. Migrations are applied to
+    every database shard in turn.
 
     """
-    db_uri = _get_db_uri()
-    connectable = sa.create_engine(db_uri, poolclass=sa_pool.NullPool)
+    for db_uri in _get_shard_db_uris():
+        connectable = sa.create_engine(db_uri, poolclass=sa_pool.NullPool)
 
-    with connectable.connect() as connection:
-        context.configure(connection=connection, target_metadata=target_metadata)
+        with connectable.connect() as connection:
+            context.configure(connection=connection, target_metadata=target_metadata)
 
-        with context.begin_transaction():
-            context.run_migrations()
+            with context.begin_transaction():
+                context.run_migrations()
 
 
 if context.is_offline_mode():
@@ -0,0 +1,138 @@
+"""Benchmark the CPU cost of response compression against the bytes it saves.
+
+Compresses serialized healthcheck lists of different sizes with every supported
+content coding and prints the results as JSON.
+"""
+import argparse
+import statistics
+import time
+import typing as t
+import uuid
+
+import orjson
+
+import {{cookiecutter.service_name}}._compression as svc_compression
+
+DEFAULT_ITEM_COUNTS: t.Final[list[int]] = [1, 10, 100, 1000, 10000]
+DEFAULT_REPEATS: t.Final[int] = 20
+# Size of a chunk of a streamed body, mirrors the typical socket write size
+STREAM_CHUNK_SIZE: t.Final[int] = 16 * 1024
+
+
+def _make_payload(item_count: int) -> bytes:
+    """Return a serialized list of healthchecks, like a list endpoint would.
+
+    Args:
+        item_count: The number of items in the list.
+
+    Returns:
+        The serialized payload.
+    """
+    items = [{"id": str(uuid.uuid4()), "status": "ok"} for _ in range(item_count)]
+    return orjson.dumps(items)
+
+
+def _compress(
+    factory: svc_compression.CompressorFactory, payload: bytes, *, streamed: bool
+) -> bytes:
+    """Compress the payload the same way the compression middleware does.
+
+    Args:
+        factory: Creates the compressor to use.
+        payload: The payload to compress.
+        streamed: Whether to compress the payload chunk by chunk, flushing
+            every chunk.
+
+    Returns:
+        The compressed payload.
+    """
+    compressor = factory()
+    if not streamed:
+        return compressor.compress(payload) + compressor.finish()
+
+    compressed = b""
+    for start in range(0, len(payload), STREAM_CHUNK_SIZE):
+        end = start + STREAM_CHUNK_SIZE
+        compressed += compressor.compress(payload[start:end]) + compressor.flush()
+    return compressed + compressor.finish()
+
+
+def _benchmark(
+    encoding: str,
+    factory: svc_compression.CompressorFactory,
+    payload: bytes,
+    *,
+    streamed: bool,
+    repeats: int,
+) -> dict[str, t.Any]:
+    """Measure compression of a single payload.
+
+    Args:
+        encoding: The content coding.
+        factory: Creates the compressor for the coding.
+        payload: The payload to compress.
+        streamed: Whether to compress the payload chunk by chunk.
+        repeats: How many times to compress the payload.
+
+    Returns:
+        The benchmark results.
+    """
+    cpu_times = []
+    for _ in range(repeats):
+        started_at = time.process_time()
+        compressed = _compress(factory, payload, streamed=streamed)
+        cpu_times.append(time.process_time() - started_at)
+
+    cpu_time = statistics.median(cpu_times)
+    bytes_saved = len(payload) - len(compressed)
+    # Tiny payloads can compress faster than the resolution of the CPU clock
+    cpu_ms = max(cpu_time * 1e3, 1e-3)
+    return {
+        "encoding": encoding,
+        "streamed": streamed,
+        "original_bytes": len(payload),
+        "compressed_bytes": len(compressed),
+        "bytes_saved": bytes_saved,
+        "ratio": round(len(compressed) / len(payload), 4),
+        "cpu_us": round(cpu_time * 1e6, 1),
+        # How many bytes are saved per millisecond of CPU time spent
+        "bytes_saved_per_cpu_ms": round(bytes_saved / cpu_ms, 1),
+    }
+
+
+def main(argv: t.Optional[list[str]] = None) -> None:
+    """Run the benchmark.
+
+    Args:
+        argv: Command line arguments.
+    """
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        "--items",
+        type=int,
+        nargs="+",
+        default=DEFAULT_ITEM_COUNTS,
+        help="Numbers of items in benchmarked payloads.",
+    )
+    parser.add_argument("--repeats", type=int, default=DEFAULT_REPEATS)
+    parser.add_argument("--gzip-level", type=int, default=6)
+    parser.add_argument("--brotli-quality", type=int, default=4)
+    parser.add_argument("--zstd-level", type=int, default=3)
+    args = parser.parse_args(argv)
+
+    factories = svc_compression.make_compressor_factories(
+        gzip_level=args.gzip_level,
+        brotli_quality=args.brotli_quality,
+        zstd_level=args.zstd_level,
+    )
+    results = [
+        _benchmark(encoding, factory, payload, streamed=streamed, repeats=args.repeats)
+        for payload in map(_make_payload, args.items)
+        for encoding, factory in factories.items()
+        for streamed in (False, True)
+    ]
+    print(orjson.dumps(results, option=orjson.OPT_INDENT_2).decode())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,366 @@
+"""Measure latency and throughput of the application under load.
+
+Sends requests either to the application in-process over ASGI or to a running
+server over HTTP, and prints latency percentiles, throughput and the error
+rate as JSON. Load comes from a fixed number of concurrent clients or arrives
+at a fixed request rate.
+
+If a baseline of earlier results exists, the command fails if any result is
+worse than the baseline by more than the allowed margin, so performance
+regressions are caught before deploy. The baseline is kept next to this
+script, so that it is versioned with the code it measures. Only results of
+the same kind of run as the baseline are comparable, so the command refuses
+to compare others.
+"""
+import argparse
+import asyncio
+import collections.abc as col_abc
+import contextlib
+import pathlib
+import statistics
+import sys
+import time
+import typing as t
+
+import httpx
+import orjson
+
+DEFAULT_PATH: t.Final[str] = "/health/"
+DEFAULT_REQUESTS: t.Final[int] = 1000
+DEFAULT_CONCURRENCY: t.Final[int] = 10
+DEFAULT_MAX_REGRESSION: t.Final[float] = 0.1
+DEFAULT_BASELINE: t.Final[pathlib.Path] = pathlib.Path(__file__).with_name(
+    "load_baseline.json"
+)
+# Responses with this status or above are counted as errors
+ERROR_STATUS: t.Final[int] = 400
+
+# Results that regress when they grow, and results that regress when they
+# drop. The maximum latency is a single sample, too noisy to compare
+LOWER_IS_BETTER: t.Final[tuple[str, ...]] = (
+    "p50_ms",
+    "p95_ms",
+    "p99_ms",
+    "error_rate",
+)
+HIGHER_IS_BETTER: t.Final[tuple[str, ...]] = ("throughput_rps",)
+# Settings of a run that have to match the baseline for results to compare
+RUN_SETTINGS: t.Final[tuple[str, ...]] = ("target", "path", "load", "requests")
+
+
+class _Sample(t.NamedTuple):
+    """The outcome of a single request."""
+
+    latency: float
+    failed: bool
+
+
+@contextlib.asynccontextmanager
+async def _make_client(
+    url: t.Optional[str], *, max_connections: t.Optional[int]
+) -> col_abc.AsyncIterator[httpx.AsyncClient]:
+    """Return a client of the application under load.
+
+    Args:
+        url: The URL of a running server, `None` to run the app in-process.
+        max_connections: The most connections open to the server at once,
+            `None` for no limit.
+
+    Yields:
+        The client.
+    """
+    if url is not None:
+        limits = httpx.Limits(
+            max_connections=max_connections, max_keepalive_connections=max_connections
+        )
+        async with httpx.AsyncClient(base_url=url, limits=limits) as client:
+            yield client
+        return
+
+    # Imported only when needed, since creating the app requires its config
+    import {{cookiecutter.service_name}}.main as svc_main
+
+    # The ASGI transport does not send lifespan events, so the app is started
+    # and stopped here
+    await svc_main.app.router.startup()
+    try:
+        async with httpx.AsyncClient(
+            app=svc_main.app, base_url="http://load-test"
+        ) as client:
+            yield client
+    finally:
+        await svc_main.app.router.shutdown()
+
+
+async def _send(client: httpx.AsyncClient, path: str, scheduled_at: float) -> _Sample:
+    """Send a request and measure its latency.
+
+    Args:
+        client: The client of the application.
+        path: The requested path.
+        scheduled_at: When the request was due to be sent. Latency counts from
+            then, so requests delayed by an overloaded app are not reported as
+            fast.
+
+    Returns:
+        The outcome of the request.
+    """
+    try:
+        response = await client.get(path)
+        failed = response.status_code >= ERROR_STATUS
+    except httpx.HTTPError:
+        failed = True
+    return _Sample(time.perf_counter() - scheduled_at, failed)
+
+
+async def _run_concurrently(
+    client: httpx.AsyncClient, path: str, *, requests: int, concurrency: int
+) -> list[_Sample]:
+    """Send requests from concurrent clients that wait for their responses.
+
+    Args:
+        client: The client of the application.
+        path: The requested path.
+        requests: How many requests to send.
+        concurrency: How many requests are in flight at once.
+
+    Returns:
+        Outcomes of the requests.
+    """
+    samples: list[_Sample] = []
+    remaining = requests
+
+    async def run_client() -> None:
+        nonlocal remaining
+        while remaining > 0:
+            remaining -= 1
+            samples.append(await _send(client, path, time.perf_counter()))
+
+    await asyncio.gather(*(run_client() for _ in range(concurrency)))
+    return samples
+
+
+async def _run_at_rate(
+    client: httpx.AsyncClient, path: str, *, requests: int, rate: float
+) -> list[_Sample]:
+    """Send requests at a fixed rate, regardless of how fast responses come.
+
+    Args:
+        client: The client of the application.
+        path: The requested path.
+        requests: How many requests to send.
+        rate: How many requests to send per second.
+
+    Returns:
+        Outcomes of the requests.
+    """
+    started_at = time.perf_counter()
+    tasks = []
+    for index in range(requests):
+        scheduled_at = started_at + index / rate
+        await asyncio.sleep(max(scheduled_at - time.perf_counter(), 0))
+        tasks.append(asyncio.create_task(_send(client, path, scheduled_at)))
+    return list(await asyncio.gather(*tasks))
+
+
+def _summarize(samples: col_abc.Sequence[_Sample], duration: float) -> dict[str, t.Any]:
+    """Summarize outcomes of requests.
+
+    Args:
+        samples: Outcomes of the requests.
+        duration: How long sending the requests took, in seconds.
+
+    Returns:
+        Latency percentiles, throughput and the error rate.
+    """
+    latencies_ms = sorted(sample.latency * 1e3 for sample in samples)
+    percentiles = statistics.quantiles(latencies_ms, n=100, method="inclusive")
+    errors = sum(sample.failed for sample in samples)
+    return {
+        "requests": len(samples),
+        "errors": errors,
+        "error_rate": round(errors / len(samples), 4),
+        "throughput_rps": round(len(samples) / duration, 1),
+        "p50_ms": round(percentiles[49], 3),
+        "p95_ms": round(percentiles[94], 3),
+        "p99_ms": round(percentiles[98], 3),
+        "max_ms": round(latencies_ms[-1], 3),
+    }
+
+
+def _find_regressions(
+    results: col_abc.Mapping[str, t.Any],
+    baseline: col_abc.Mapping[str, t.Any],
+    max_regression: float,
+) -> list[str]:
+    """Compare results with a baseline.
+
+    Args:
+        results: The results.
+        baseline: Earlier results to compare with.
+        max_regression: How much worse than the baseline a result may be, as
+            a fraction of the baseline.
+
+    Returns:
+        Descriptions of results that regressed past the margin. Results
+        missing from the baseline, like ones added after it was saved, are not
+        compared.
+    """
+    regressions = []
+    for metric in LOWER_IS_BETTER:
+        if metric not in baseline:
+            continue
+        limit = baseline[metric] * (1 + max_regression)
+        if results[metric] > limit:
+            regressions.append(
+                f"{metric} is {results[metric]}, the baseline allows up to {limit:.4g}"
+            )
+    for metric in HIGHER_IS_BETTER:
+        if metric not in baseline:
+            continue
+        limit = baseline[metric] * (1 - max_regression)
+        if results[metric] < limit:
+            regressions.append(
+                f"{metric} is {results[metric]}, the baseline allows down to "
+                f"{limit:.4g}"
+            )
+    return regressions
+
+
+def _find_mismatches(
+    run: col_abc.Mapping[str, t.Any], baseline: col_abc.Mapping[str, t.Any]
+) -> list[str]:
+    """Compare settings of a run with the ones the baseline was measured with.
+
+    Args:
+        run: Settings of the run.
+        baseline: Earlier results to compare with.
+
+    Returns:
+        Descriptions of settings that differ from the baseline.
+    """
+    return [
+        f"{setting} is {run[setting]!r}, the baseline has {baseline.get(setting)!r}"
+        for setting in RUN_SETTINGS
+        if run[setting] != baseline.get(setting)
+    ]
+
+
+def _describe_run(args: argparse.Namespace) -> dict[str, t.Any]:
+    """Return the settings of a run that determine its results.
+
+    Args:
+        args: Parsed command line arguments.
+
+    Returns:
+        The settings.
+    """
+    if args.rate is not None:
+        load = {"rate": args.rate}
+    else:
+        load = {"concurrency": args.concurrency}
+    return {
+        "target": args.url or "asgi",
+        "path": args.path,
+        "load": load,
+        "requests": args.requests,
+    }
+
+
+async def _run(args: argparse.Namespace) -> dict[str, t.Any]:
+    """Put the application under load.
+
+    Args:
+        args: Parsed command line arguments.
+
+    Returns:
+        The results.
+    """
+    max_connections = None if args.rate is not None else args.concurrency
+    async with _make_client(args.url, max_connections=max_connections) as client:
+        started_at = time.perf_counter()
+        if args.rate is not None:
+            samples = await _run_at_rate(
+                client, args.path, requests=args.requests, rate=args.rate
+            )
+        else:
+            samples = await _run_concurrently(
+                client, args.path, requests=args.requests, concurrency=args.concurrency
+            )
+        duration = time.perf_counter() - started_at
+
+    return _describe_run(args) | _summarize(samples, duration)
+
+
+def main(argv: t.Optional[list[str]] = None) -> int:
+    """Run the load test.
+
+    Args:
+        argv: Command line arguments.
+
+    Returns:
+        1 if results regressed past the baseline, else 0, as the exit status.
+    """
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        "--url",
+        help="The URL of a running server. The app is run in-process if not set.",
+    )
+    parser.add_argument("--path", default=DEFAULT_PATH)
+    parser.add_argument("--requests", type=int, default=DEFAULT_REQUESTS)
+    load = parser.add_mutually_exclusive_group()
+    load.add_argument(
+        "--concurrency",
+        type=int,
+        default=DEFAULT_CONCURRENCY,
+        help="How many requests are in flight at once.",
+    )
+    load.add_argument(
+        "--rate", type=float, help="Send this many requests per second instead."
+    )
+    parser.add_argument(
+        "--baseline",
+        type=pathlib.Path,
+        default=DEFAULT_BASELINE,
+        help="A JSON file with earlier results to compare with, if it exists.",
+    )
+    parser.add_argument(
+        "--max-regression",
+        type=float,
+        default=DEFAULT_MAX_REGRESSION,
+        help="How much worse than the baseline results may be, as a fraction.",
+    )
+    parser.add_argument(
+        "--save-baseline",
+        action="store_true",
+        help="Store the results as the baseline instead of comparing with it.",
+    )
+    args = parser.parse_args(argv)
+    if args.requests < 2:
+        parser.error("at least 2 requests are needed to compute percentiles")
+
+    baseline = None
+    if not args.save_baseline and args.baseline.exists():
+        baseline = orjson.loads(args.baseline.read_bytes())
+        mismatches = _find_mismatches(_describe_run(args), baseline)
+        if mismatches:
+            mismatch_list = "; ".join(mismatches)
+            parser.error(
+                f"{args.baseline} was measured with other settings: {mismatch_list}"
+            )
+
+    results = asyncio.run(_run(args))
+
+    if args.save_baseline:
+        args.baseline.write_bytes(orjson.dumps(results, option=orjson.OPT_INDENT_2))
+    elif baseline is not None:
+        results["regressions"] = _find_regressions(
+            results, baseline, args.max_regression
+        )
+
+    print(orjson.dumps(results, option=orjson.OPT_INDENT_2).decode())
+    return 1 if results.get("regressions") else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,186 @@
+"""Per-route memory allocation tracking.
+
+Measures allocations of a sample of requests with `tracemalloc` to find
+routes that retain memory between requests.
+"""
+import collections
+import collections.abc as col_abc
+import contextlib
+import random
+import tracemalloc
+
+import starlette.types as st_types
+
+import {{cookiecutter.service_name}}._models as mdl
+import {{cookiecutter.service_name}}._routing as routing
+
+
+class _RouteStats:
+    """Aggregated allocations of the sampled requests to a single route."""
+
+    def __init__(self) -> None:
+        """Create empty route stats."""
+        self.sampled_requests = 0
+        self.retained_blocks = 0
+        self.retained_bytes = 0
+        self.peak_bytes = 0
+        self.site_bytes: collections.Counter[tuple[str, int]] = collections.Counter()
+        self.site_blocks: collections.Counter[tuple[str, int]] = collections.Counter()
+
+
+class AllocationTracker:
+    """Tracks memory allocations of requests per route.
+
+    Allocations are traced only while a sampled request runs, so the traces
+    left when it ends are the memory it retained, and requests that are not
+    sampled do not pay for tracing. `tracemalloc` traces the whole process,
+    so only one request is measured at a time. Allocations of other requests
+    that run concurrently are still attributed to the measured one, which is
+    why the results should be read as aggregates over many samples.
+    """
+
+    def __init__(self, *, sample_rate: float, top_sites: int) -> None:
+        """Create an allocation tracker.
+
+        Args:
+            sample_rate: The share of requests that will be measured.
+            top_sites: How many allocation sites to report per route.
+        """
+        self._sample_rate = sample_rate
+        self._top_sites = top_sites
+        self._routes: dict[str, _RouteStats] = {}
+        self._measuring = False
+
+    def should_sample(self) -> bool:
+        """Decide whether the next request should be measured.
+
+        Returns:
+            Whether the next request should be measured. Requests are not
+            measured while something else traces allocations, as its traces
+            would be attributed to them.
+        """
+        if self._measuring or tracemalloc.is_tracing():
+            return False
+        # Sampling does not need to be cryptographically secure
+        return random.random() < self._sample_rate  # noqa: S311
+
+    @contextlib.contextmanager
+    def measure(self, route: str) -> col_abc.Iterator[None]:
+        """Measure allocations made inside the context and attribute them.
+
+        Args:
+            route: The route the allocations will be attributed to.
+
+        Yields:
+            Control to the measured code.
+        """
+        self._measuring = True
+        tracemalloc.start()
+        try:
+            yield
+        finally:
+            _, peak_bytes = tracemalloc.get_traced_memory()
+            snapshot = self._take_snapshot()
+            tracemalloc.stop()
+            self._measuring = False
+            self._record(route, snapshot.statistics("lineno"), peak_bytes)
+
+    def report(self) -> list[mdl.RouteAllocations]:
+        """Report allocations of the sampled requests.
+
+        Returns:
+            Allocations per route, the routes that retained the most memory
+            come first.
+        """
+        reports = [
+            mdl.RouteAllocations(
+                route=route,
+                sampled_requests=stats.sampled_requests,
+                retained_blocks=stats.retained_blocks,
+                retained_bytes=stats.retained_bytes,
+                peak_bytes=stats.peak_bytes,
+                top_sites=[
+                    mdl.AllocationSite(
+                        filename=filename,
+                        lineno=lineno,
+                        size_bytes=size_bytes,
+                        blocks=stats.site_blocks[filename, lineno],
+                    )
+                    for (filename, lineno), size_bytes in stats.site_bytes.most_common(
+                        self._top_sites
+                    )
+                ],
+            )
+            for route, stats in self._routes.items()
+        ]
+        return sorted(reports, key=lambda report: report.retained_bytes, reverse=True)
+
+    @staticmethod
+    def _take_snapshot() -> tracemalloc.Snapshot:
+        """Take a snapshot of traced allocations, excluding tracemalloc's own.
+
+        Returns:
+            The snapshot.
+        """
+        snapshot = tracemalloc.take_snapshot()
+        return snapshot.filter_traces(
+            [
+                tracemalloc.Filter(False, tracemalloc.__file__),
+                tracemalloc.Filter(False, __file__),
+            ]
+        )
+
+    def _record(
+        self,
+        route: str,
+        retained: col_abc.Iterable[tracemalloc.Statistic],
+        peak_bytes: int,
+    ) -> None:
+        """Record allocations of a measured request.
+
+        Args:
+            route: The route the allocations are attributed to.
+            retained: Allocations made during the request that were still
+                alive at its end, per allocation site.
+            peak_bytes: Peak memory usage during the request.
+        """
+        stats = self._routes.setdefault(route, _RouteStats())
+        stats.sampled_requests += 1
+        stats.peak_bytes = max(stats.peak_bytes, peak_bytes)
+        for statistic in retained:
+            frame = statistic.traceback[0]
+            stats.retained_bytes += statistic.size
+            stats.retained_blocks += statistic.count
+            stats.site_bytes[frame.filename, frame.lineno] += statistic.size
+            stats.site_blocks[frame.filename, frame.lineno] += statistic.count
+
+
+class AllocationTrackingMiddleware:
+    """An ASGI middleware that measures allocations of sampled requests."""
+
+    def __init__(self, app: st_types.ASGIApp, *, tracker: AllocationTracker) -> None:
+        """Create an allocation tracking middleware.
+
+        Args:
+            app: The wrapped ASGI application.
+            tracker: The tracker that measures and stores allocations.
+        """
+        self._app = app
+        self._tracker = tracker
+
+    async def __call__(
+        self, scope: st_types.Scope, receive: st_types.Receive, send: st_types.Send
+    ) -> None:
+        """Handle an ASGI connection.
+
+        Args:
+            scope: The connection scope.
+            receive: A callable that receives ASGI events.
+            send: A callable that sends ASGI events.
+        """
+        if scope["type"] != "http" or not self._tracker.should_sample():
+            await self._app(scope, receive, send)
+            return
+
+        with self._tracker.measure(routing.route_path(scope)):
+            await self._app(scope, receive, send)
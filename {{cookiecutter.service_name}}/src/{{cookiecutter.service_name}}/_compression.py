@@ -0,0 +1,403 @@
+"""Response compression.
+
+Negotiates a content coding with the client via the `Accept-Encoding` header
+and compresses response bodies on the fly with Zstandard, Brotli or gzip.
+"""
+import collections.abc as col_abc
+import typing as t
+import zlib
+
+import brotli
+import starlette.datastructures as st_ds
+import starlette.types as st_types
+import zstandard
+
+
+# Makes zlib write a gzip header and trailer instead of a zlib one
+_GZIP_WBITS: t.Final[int] = zlib.MAX_WBITS | 16
+
+
+class ICompressor(t.Protocol):
+    """A protocol for incremental compressors."""
+
+    def compress(self, data: bytes) -> bytes:
+        """Compress a chunk of data.
+
+        Args:
+            data: The data to compress.
+
+        Returns:  # noqa: DAR202, protocols dont provide implementation
+            Compressed data that is ready to be sent, may be empty.
+        """
+
+    def flush(self) -> bytes:
+        """Flush the data buffered so far, so a client can decode it.
+
+        Returns:  # noqa: DAR202, protocols dont provide implementation
+            The flushed compressed data.
+        """
+
+    def finish(self) -> bytes:
+        """Finish the compressed stream.
+
+        Returns:  # noqa: DAR202, protocols dont provide implementation
+            The remaining compressed data, including the stream trailer.
+        """
+
+
+CompressorFactory = t.Callable[[], ICompressor]
+
+
+class GzipCompressor:
+    """An incremental gzip compressor."""
+
+    def __init__(self, level: int) -> None:
+        """Create a gzip compressor.
+
+        Args:
+            level: The compression level.
+        """
+        self._compressobj = zlib.compressobj(level, zlib.DEFLATED, _GZIP_WBITS)
+
+    def compress(self, data: bytes) -> bytes:
+        """Compress a chunk of data.
+
+        Args:
+            data: The data to compress.
+
+        Returns:
+            Compressed data that is ready to be sent, may be empty.
+        """
+        return self._compressobj.compress(data)
+
+    def flush(self) -> bytes:
+        """Flush the data buffered so far, so a client can decode it.
+
+        Returns:
+            The flushed compressed data.
+        """
+        return self._compressobj.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self) -> bytes:
+        """Finish the compressed stream.
+
+        Returns:
+            The remaining compressed data, including the stream trailer.
+        """
+        return self._compressobj.flush(zlib.Z_FINISH)
+
+
+class BrotliCompressor:
+    """An incremental Brotli compressor."""
+
+    def __init__(self, quality: int) -> None:
+        """Create a Brotli compressor.
+
+        Args:
+            quality: The compression quality.
+        """
+        self._compressor = brotli.Compressor(quality=quality)
+
+    def compress(self, data: bytes) -> bytes:
+        """Compress a chunk of data.
+
+        Args:
+            data: The data to compress.
+
+        Returns:
+            Compressed data that is ready to be sent, may be empty.
+        """
+        return self._compressor.process(data)
+
+    def flush(self) -> bytes:
+        """Flush the data buffered so far, so a client can decode it.
+
+        Returns:
+            The flushed compressed data.
+        """
+        return self._compressor.flush()
+
+    def finish(self) -> bytes:
+        """Finish the compressed stream.
+
+        Returns:
+            The remaining compressed data, including the stream trailer.
+        """
+        return self._compressor.finish()
+
+
+class ZstdCompressor:
+    """An incremental Zstandard compressor."""
+
+    def __init__(self, level: int) -> None:
+        """Create a Zstandard compressor.
+
+        Args:
+            level: The compression level.
+        """
+        self._compressobj = zstandard.ZstdCompressor(level=level).compressobj()
+
+    def compress(self, data: bytes) -> bytes:
+        """Compress a chunk of data.
+
+        Args:
+            data: The data to compress.
+
+        Returns:
+            Compressed data that is ready to be sent, may be empty.
+        """
+        return self._compressobj.compress(data)
+
+    def flush(self) -> bytes:
+        """Flush the data buffered so far, so a client can decode it.
+
+        Returns:
+            The flushed compressed data.
+        """
+        return self._compressobj.flush(zstandard.COMPRESSOBJ_FLUSH_BLOCK)
+
+    def finish(self) -> bytes:
+        """Finish the compressed stream.
+
+        Returns:
+            The remaining compressed data, including the stream trailer.
+        """
+        return self._compressobj.flush(zstandard.COMPRESSOBJ_FLUSH_FINISH)
+
+
+def make_compressor_factories(
+    *, gzip_level: int = 6, brotli_quality: int = 4, zstd_level: int = 3
+) -> dict[str, CompressorFactory]:
+    """Return factories of compressors of all supported content codings.
+
+    Args:
+        gzip_level: The gzip compression level.
+        brotli_quality: The Brotli compression quality.
+        zstd_level: The Zstandard compression level.
+
+    Returns:
+        A mapping of content codings to compressor factories, ordered from the
+        most preferred coding to the least preferred one.
+    """
+    return {
+        "zstd": lambda: ZstdCompressor(zstd_level),
+        "br": lambda: BrotliCompressor(brotli_quality),
+        "gzip": lambda: GzipCompressor(gzip_level),
+    }
+
+
+def _parse_quality(params: col_abc.Sequence[str]) -> float:
+    """Return the quality value from the parameters of an `Accept-Encoding` item.
+
+    Args:
+        params: The parameters that follow the coding, like `q=0.5`.
+
+    Returns:
+        The quality value. Malformed values are treated as unacceptable.
+    """
+    for param in params:
+        name, _, value = param.partition("=")
+        if name.strip().lower() != "q":
+            continue
+        try:
+            return min(max(float(value), 0.0), 1.0)
+        except ValueError:
+            return 0.0
+    return 1.0
+
+
+def negotiate_encoding(
+    accept_encoding: str, available: col_abc.Sequence[str]
+) -> t.Optional[str]:
+    """Pick a content coding that satisfies the client.
+
+    Args:
+        accept_encoding: The value of the `Accept-Encoding` request header.
+        available: Content codings the server supports, from the most
+            preferred one to the least preferred one.
+
+    Returns:
+        The content coding with the highest client quality value, ties are
+        resolved by server preference. `None` if the client does not accept
+        any of the available codings.
+    """
+    qualities: dict[str, float] = {}
+    for item in accept_encoding.split(","):
+        coding, *params = item.split(";")
+        coding = coding.strip().lower()
+        if coding:
+            qualities[coding] = _parse_quality(params)
+
+    wildcard_quality = qualities.get("*", 0.0)
+    best_coding, best_quality = None, 0.0
+    for coding in available:
+        quality = qualities.get(coding, wildcard_quality)
+        if quality > best_quality:
+            best_coding, best_quality = coding, quality
+    return best_coding
+
+
+class CompressionMiddleware:
+    """An ASGI middleware that compresses response bodies.
+
+    Single-message bodies below the size threshold are sent as is. Streamed
+    bodies are compressed and flushed chunk by chunk, so they are never
+    buffered as a whole.
+    """
+
+    def __init__(
+        self,
+        app: st_types.ASGIApp,
+        *,
+        minimum_size: int = 500,
+        gzip_level: int = 6,
+        brotli_quality: int = 4,
+        zstd_level: int = 3,
+    ) -> None:
+        """Create a compression middleware.
+
+        Args:
+            app: The wrapped ASGI application.
+            minimum_size: Size of the smallest body, in bytes, that will be
+                compressed.
+            gzip_level: The gzip compression level.
+            brotli_quality: The Brotli compression quality.
+            zstd_level: The Zstandard compression level.
+        """
+        self._app = app
+        self._minimum_size = minimum_size
+        self._factories = make_compressor_factories(
+            gzip_level=gzip_level, brotli_quality=brotli_quality, zstd_level=zstd_level
+        )
+
+    async def __call__(
+        self, scope: st_types.Scope, receive: st_types.Receive, send: st_types.Send
+    ) -> None:
+        """Handle an ASGI connection.
+
+        Args:
+            scope: The connection scope.
+            receive: A callable that receives ASGI events.
+            send: A callable that sends ASGI events.
+        """
+        if scope["type"] != "http":
+            await self._app(scope, receive, send)
+            return
+
+        headers = st_ds.Headers(scope=scope)
+        encoding = negotiate_encoding(
+            headers.get("accept-encoding", ""), list(self._factories)
+        )
+        if encoding is None:
+            await self._app(scope, receive, send)
+            return
+
+        responder = _CompressingResponder(
+            send, encoding, self._factories[encoding], self._minimum_size
+        )
+        await self._app(scope, receive, responder.send)
+
+
+class _CompressingResponder:
+    """Compresses the response messages of a single request."""
+
+    def __init__(
+        self,
+        send: st_types.Send,
+        encoding: str,
+        compressor_factory: CompressorFactory,
+        minimum_size: int,
+    ) -> None:
+        """Create a compressing responder.
+
+        Args:
+            send: A callable that sends ASGI events to the client.
+            encoding: The negotiated content coding.
+            compressor_factory: Creates a compressor for the coding.
+            minimum_size: Size of the smallest body that will be compressed.
+        """
+        self._send = send
+        self._encoding = encoding
+        self._compressor_factory = compressor_factory
+        self._minimum_size = minimum_size
+        self._start_message: st_types.Message = {}
+        self._compressor: t.Optional[ICompressor] = None
+        self._started = False
+
+    async def send(self, message: st_types.Message) -> None:
+        """Send an ASGI event, compressing the body if needed.
+
+        Args:
+            message: The ASGI event to send.
+        """
+        if message["type"] == "http.response.start":
+            # Headers depend on the first body chunk, so hold them back
+            self._start_message = message
+        elif message["type"] == "http.response.body" and not self._started:
+            self._started = True
+            await self._send_first_body(message)
+        elif message["type"] == "http.response.body" and self._compressor:
+            await self._send(self._compress(message))
+        else:
+            await self._send(message)
+
+    async def _send_first_body(self, message: st_types.Message) -> None:
+        """Send the response headers and the first body chunk.
+
+        Args:
+            message: The first body event.
+        """
+        headers = st_ds.MutableHeaders(raw=self._start_message["headers"])
+        if "content-encoding" in headers or not self._should_compress(headers, message):
+            await self._send(self._start_message)
+            await self._send(message)
+            return
+
+        self._compressor = self._compressor_factory()
+        message = self._compress(message)
+
+        headers["Content-Encoding"] = self._encoding
+        headers.add_vary_header("Accept-Encoding")
+        if message.get("more_body", False):
+            # The final length of a streamed body is unknown
+            del headers["Content-Length"]
+        else:
+            headers["Content-Length"] = str(len(message["body"]))
+
+        await self._send(self._start_message)
+        await self._send(message)
+
+    def _should_compress(
+        self, headers: st_ds.MutableHeaders, message: st_types.Message
+    ) -> bool:
+        """Check whether the response is large enough to be compressed.
+
+        Args:
+            headers: Headers of the response.
+            message: The first body event.
+
+        Returns:
+            Whether the response should be compressed.
+        """
+        if "content-length" in headers:
+            return int(headers["content-length"]) >= self._minimum_size
+        if message.get("more_body", False):
+            # A streamed body of an unknown length is assumed to be large
+            return True
+        return len(message.get("body", b"")) >= self._minimum_size
+
+    def _compress(self, message: st_types.Message) -> st_types.Message:
+        """Return a copy of a body event with the compressed body.
+
+        Args:
+            message: The body event.
+
+        Returns:
+            The body event with the compressed body.
+        """
+        compressor = t.cast(ICompressor, self._compressor)
+        more_body = message.get("more_body", False)
+
+        body = compressor.compress(message.get("body", b""))
+        body += compressor.flush() if more_body else compressor.finish()
+        return {**message, "body": body}
@@ -3,8 +3,14 @@ import databases
 import dependency_injector.containers as di_containers
 import dependency_injector.providers as di_providers
 
+import {{cookiecutter.service_name}}._allocations as allocations
+import {{cookiecutter.service_name}}._deadlines as deadlines
+import {{cookiecutter.service_name}}._profiling as profiling
 import {{cookiecutter.service_name}}._repositories as repos
 import {{cookiecutter.service_name}}._services as svc
+import {{cookiecutter.service_name}}._sharding as sharding
+import {{cookiecutter.service_name}}._tracing as tracing
+import {{cookiecutter.service_name}}._warmup as warmup
 
 
 class Container(di_containers.DeclarativeContainer):
@@ -15,6 +21,69 @@ class Container(di_containers.DeclarativeContainer):
 
     config = di_providers.Configuration()
 
-    db = di_providers.Singleton(databases.Database, config.database_dsn)
-    healthcheck_repo = di_providers.Factory(repos.HealthCheckRepository, db=db)
+    db = di_providers.Singleton(
+        databases.Database,
+        config.database_dsn,
+        min_size=config.database_pool.min_size,
+        max_size=config.database_pool.max_size,
+        command_timeout=config.database_pool.command_timeout,
+    )
+    # Overriding `db` also replaces the first shard
+    shard_router = di_providers.Singleton(
+        sharding.ShardRouter.from_dsns,
+        primary=db,
+        primary_dsn=config.database_dsn,
+        dsns=config.database_shard_dsns,
+        pool_options=config.database_pool,
+    )
+    # A factory, so that reloaded deadline settings apply to the next request
+    deadline_policy = di_providers.Factory(
+        deadlines.DeadlinePolicy,
+        default_timeout=config.deadlines.default_timeout,
+        max_timeout=config.deadlines.max_timeout,
+        route_timeouts=config.deadlines.route_timeouts,
+        header_name=config.deadlines.header_name,
+    )
+
+    healthcheck_repo = di_providers.Factory(
+        repos.HealthCheckRepository, router=shard_router
+    )
     healthcheck_svc = di_providers.Factory(svc.HealthService, repo=healthcheck_repo)
+
+    # The app to send warm-up requests to is passed when the warm-up is created
+    warmup = di_providers.Factory(
+        warmup.Warmup,
+        dbs=shard_router.provided.shards,
+        statements=healthcheck_repo.provided.statements.call(),
+        connections=config.database_pool.min_size,
+        requests=config.warmup.requests,
+        timeout=config.warmup.timeout,
+    )
+
+    allocation_tracker = di_providers.Singleton(
+        allocations.AllocationTracker,
+        sample_rate=config.allocation_tracking.sample_rate,
+        top_sites=config.allocation_tracking.top_sites,
+    )
+    span_exporter = di_providers.Selector(
+        config.tracing.exporter,
+        file=di_providers.Singleton(
+            tracing.FileSpanExporter,
+            path=config.tracing.file_path,
+            max_queued_spans=config.tracing.max_queued_spans,
+            flush_interval=config.tracing.flush_interval,
+        ),
+        in_memory=di_providers.Singleton(
+            tracing.InMemorySpanExporter, max_spans=config.tracing.max_queued_spans
+        ),
+    )
+    tracer = di_providers.Singleton(
+        tracing.Tracer,
+        exporter=span_exporter,
+        sample_rate=config.tracing.sample_rate,
+        service_name=config.name,
+    )
+    profiler = di_providers.Singleton(
+        profiling.SamplingProfiler,
+        sample_interval=config.profiling.sample_interval,
+    )
@@ -0,0 +1,230 @@
+"""Request deadlines.
+
+Every request gets a deadline: the moment after which nobody waits for its
+result anymore. The deadline is passed down to repositories, so queries stop
+wasting database capacity once the client has given up.
+"""
+import asyncio
+import collections.abc as col_abc
+import contextlib
+import time
+import typing as t
+
+import starlette.types as st_types
+
+T = t.TypeVar("T")
+
+
+class DeadlineExceededError(TimeoutError):
+    """The deadline of a request was exceeded."""
+
+
+class Deadline:
+    """A point in time by which an operation should finish."""
+
+    def __init__(self, expires_at: float) -> None:
+        """Create a deadline.
+
+        Args:
+            expires_at: When the deadline expires, in terms of
+                `time.monotonic()`.
+        """
+        self.expires_at = expires_at
+
+    @classmethod
+    def after(cls, timeout: float) -> "Deadline":
+        """Create a deadline that expires after the timeout from now.
+
+        Args:
+            timeout: Seconds until the deadline expires.
+
+        Returns:
+            The deadline.
+        """
+        return cls(time.monotonic() + timeout)
+
+    def remaining(self) -> float:
+        """Return the time left until the deadline.
+
+        Returns:
+            Seconds until the deadline expires, `0` if it has expired.
+        """
+        return max(self.expires_at - time.monotonic(), 0.0)
+
+
+class DeadlinePolicy:
+    """Decides the deadlines of requests."""
+
+    def __init__(
+        self,
+        *,
+        default_timeout: float,
+        max_timeout: float,
+        route_timeouts: col_abc.Mapping[str, float],
+        header_name: str,
+    ) -> None:
+        """Create a deadline policy.
+
+        Args:
+            default_timeout: The timeout of routes without a configured one.
+            max_timeout: The longest timeout a client can ask for.
+            route_timeouts: Timeouts of routes by their path templates.
+            header_name: The request header in which clients pass their
+                timeouts, in seconds.
+        """
+        self._default_timeout = default_timeout
+        self._max_timeout = max_timeout
+        self._route_timeouts = route_timeouts
+        self._header_name = header_name
+
+    def deadline_for(self, headers: col_abc.Mapping[str, str], route: str) -> Deadline:
+        """Return the deadline of a request.
+
+        Args:
+            headers: Headers of the request.
+            route: The path template of the route that handles the request.
+
+        Returns:
+            The deadline. A timeout passed by the client takes precedence over
+            the route's one, but cannot exceed the maximum timeout.
+        """
+        timeout = self._route_timeouts.get(route, self._default_timeout)
+        with contextlib.suppress(KeyError, ValueError):
+            requested_timeout = float(headers[self._header_name])
+            # Malformed timeouts are ignored, NaN fails the comparison too
+            if requested_timeout >= 0:
+                timeout = requested_timeout
+        return Deadline.after(min(timeout, self._max_timeout))
+
+
+async def wait_for(
+    awaitable: col_abc.Awaitable[T], deadline: t.Optional[Deadline]
+) -> T:
+    """Wait for an awaitable to finish before the deadline.
+
+    Args:
+        awaitable: The awaitable to wait for.
+        deadline: The deadline, `None` to wait indefinitely.
+
+    Returns:
+        The result of the awaitable.
+
+    Raises:
+        DeadlineExceededError: if the deadline expired first. The awaitable is
+            cancelled in this case.
+    """
+    if deadline is None:
+        return await awaitable
+    try:
+        return await asyncio.wait_for(awaitable, deadline.remaining())
+    except asyncio.TimeoutError as exc:
+        raise DeadlineExceededError from exc
+
+
+class CancelOnDisconnectMiddleware:
+    """An ASGI middleware that cancels requests whose clients disconnected.
+
+    Cancellation propagates to the query a request is waiting for, and the
+    database driver cancels the query on the server too.
+    """
+
+    def __init__(self, app: st_types.ASGIApp) -> None:
+        """Create a cancel on disconnect middleware.
+
+        Args:
+            app: The wrapped ASGI application.
+        """
+        self._app = app
+
+    async def __call__(
+        self, scope: st_types.Scope, receive: st_types.Receive, send: st_types.Send
+    ) -> None:
+        """Handle an ASGI connection.
+
+        Args:
+            scope: The connection scope.
+            receive: A callable that receives ASGI events.
+            send: A callable that sends ASGI events.
+
+        Raises:
+            asyncio.CancelledError: if the request was cancelled for other reasons
+                than a disconnect.
+        """
+        if scope["type"] != "http":
+            await self._app(scope, receive, send)
+            return
+
+        request = _CancellableRequest(send)
+        app_task = asyncio.create_task(self._app(scope, request.receive, request.send))
+        listener_task = asyncio.create_task(request.listen(receive, app_task))
+        try:
+            await app_task
+        except asyncio.CancelledError:
+            if not request.disconnected:
+                raise
+        finally:
+            listener_task.cancel()
+
+
+class _CancellableRequest:
+    """Relays ASGI events of a request that is cancelled on disconnect."""
+
+    def __init__(self, send: st_types.Send) -> None:
+        """Create a cancellable request.
+
+        Args:
+            send: A callable that sends ASGI events to the client.
+        """
+        self._send = send
+        # The listener stays a single event ahead of the application, so
+        # request bodies are still received only as fast as they are consumed
+        self._messages: asyncio.Queue[st_types.Message] = asyncio.Queue(maxsize=1)
+        self._client_gone = False
+        self._response_complete = False
+        self.disconnected = False
+
+    async def listen(self, receive: st_types.Receive, app_task: asyncio.Task) -> None:
+        """Receive events from the client and cancel the app on disconnect.
+
+        Args:
+            receive: A callable that receives ASGI events from the client.
+            app_task: The task that runs the application.
+        """
+        while True:
+            message = await receive()
+            if message["type"] == "http.disconnect":
+                break
+            await self._messages.put(message)
+
+        self._client_gone = True
+        with contextlib.suppress(asyncio.QueueFull):
+            # Wakes up the application if it waits for an event
+            self._messages.put_nowait(message)
+
+        # Servers report a disconnect once the response is sent, while
+        # background tasks of the response may still be running
+        if not self._response_complete:
+            self.disconnected = True
+            app_task.cancel()
+
+    async def receive(self) -> st_types.Message:
+        """Receive an event from the client.
+
+        Returns:
+            The event.
+        """
+        if self._client_gone and self._messages.empty():
+            return {"type": "http.disconnect"}
+        return await self._messages.get()
+
+    async def send(self, message: st_types.Message) -> None:
+        """Send an event to the client.
+
+        Args:
+            message: The event.
+        """
+        if message["type"] == "http.response.body" and not message.get(
+            "more_body", False
+        ):
+            self._response_complete = True
+        await self._send(message)
@@ -12,3 +12,32 @@ class HealthCheckDTO(pyd.BaseModel):
 
     id: pyd.UUID4
     status: t.Literal["ok"]
+
+
+class AllocationSiteDTO(pyd.BaseModel):
+    """A DTO for memory allocation sites."""
+
+    filename: str
+    lineno: int
+    size_bytes: int
+    blocks: int
+
+
+class RouteAllocationsDTO(pyd.BaseModel):
+    """A DTO for memory allocations of a route."""
+
+    route: str
+    sampled_requests: int
+    retained_blocks: int
+    retained_bytes: int
+    peak_bytes: int
+    top_sites: list[AllocationSiteDTO]
+
+
+class ProfilingWindowDTO(pyd.BaseModel):
+    """A DTO for profiling windows."""
+
+    # How long the window stays open, in seconds
+    duration: float = pyd.Field(..., gt=0, le=3600)
+    # The share of requests that will be profiled while the window is open
+    sample_rate: float = pyd.Field(..., gt=0, le=1)
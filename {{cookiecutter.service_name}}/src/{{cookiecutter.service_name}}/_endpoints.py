@@ -1,14 +1,61 @@
 """Endpoints of the service."""
 
+import secrets
 import typing as t
 
 import dependency_injector.wiring as di_wiring
 import fastapi as fa
 import fastapi.responses as fa_resp
+import pydantic as pyd
+import starlette.status as http_status
 
+import {{cookiecutter.service_name}}._allocations as allocations
 import {{cookiecutter.service_name}}._containers as di_c
+import {{cookiecutter.service_name}}._deadlines as dl
 import {{cookiecutter.service_name}}._dtos as dtos
+import {{cookiecutter.service_name}}._profiling as profiling
+import {{cookiecutter.service_name}}._routing as routing
 import {{cookiecutter.service_name}}._services as svc
+import {{cookiecutter.service_name}}._tracing as tracing
+
+
+@di_wiring.inject
+async def get_request_deadline(
+    request: fa.Request,
+    deadline_policy: dl.DeadlinePolicy = fa.Depends(
+        di_wiring.Provide[di_c.Container.deadline_policy]
+    ),
+) -> dl.Deadline:
+    """Return the deadline of the current request.
+
+    Args:
+        request: The current request.
+        deadline_policy: A policy that decides deadlines of requests.
+
+    Returns:
+        The deadline of the request.
+    """
+    return deadline_policy.deadline_for(
+        request.headers, routing.route_path(request.scope)
+    )
+
+
+async def handle_deadline_exceeded(
+    request: fa.Request, exc: dl.DeadlineExceededError
+) -> fa_resp.ORJSONResponse:
+    """Respond to a request whose deadline was exceeded.
+
+    Args:
+        request: The request whose deadline was exceeded.
+        exc: The raised exception.
+
+    Returns:
+        A response that tells the client the request timed out.
+    """
+    return fa_resp.ORJSONResponse(
+        {"detail": "Request deadline exceeded"},
+        status_code=http_status.HTTP_504_GATEWAY_TIMEOUT,
+    )
 
 
 RESOURCE_PREFIX: t.Final[str] = "/health"
@@ -23,14 +70,128 @@ async def return_health(
     healthcheck_svc: svc.HealthService = fa.Depends(
         di_wiring.Provide[di_c.Container.healthcheck_svc]
     ),
+    deadline: dl.Deadline = fa.Depends(get_request_deadline),
 ) -> dtos.HealthCheckDTO:
     """Return health status.
 
     Args:
         healthcheck_svc: A service that handles healthchecks' use cases.
+        deadline: The deadline of the request.
 
     Returns:
         The health status.
     """
-    healthcheck = await healthcheck_svc.get_healthcheck()
-    return dtos.HealthCheckDTO(**healthcheck.dict())
+    with tracing.span("return_health"):
+        healthcheck = await healthcheck_svc.get_healthcheck(deadline=deadline)
+        return dtos.HealthCheckDTO(**healthcheck.dict())
+
+
+@di_wiring.inject
+async def verify_admin_token(
+    x_admin_token: t.Optional[str] = fa.Header(None),
+    admin_token: t.Optional[pyd.SecretStr] = fa.Depends(
+        di_wiring.Provide[di_c.Container.config.admin_token]
+    ),
+) -> None:
+    """Allow only requests that present the admin token.
+
+    Args:
+        x_admin_token: The token presented by the client.
+        admin_token: The configured admin token.
+
+    Raises:
+        HTTPException: if admin endpoints are disabled or the presented token
+            does not match.
+    """
+    if admin_token is None:
+        # Do not disclose that admin endpoints exist when they are disabled
+        raise fa.HTTPException(status_code=http_status.HTTP_404_NOT_FOUND)
+    if x_admin_token is None or not secrets.compare_digest(
+        x_admin_token, admin_token.get_secret_value()
+    ):
+        raise fa.HTTPException(status_code=http_status.HTTP_403_FORBIDDEN)
+
+
+ADMIN_RESOURCE_PREFIX: t.Final[str] = "/admin"
+admin_router = fa.APIRouter(
+    prefix=ADMIN_RESOURCE_PREFIX,
+    default_response_class=fa_resp.ORJSONResponse,
+    dependencies=[fa.Depends(verify_admin_token)],
+)
+
+
+@admin_router.get("/allocations")
+@di_wiring.inject
+async def return_allocations(
+    allocation_tracker: allocations.AllocationTracker = fa.Depends(
+        di_wiring.Provide[di_c.Container.allocation_tracker]
+    ),
+) -> list[dtos.RouteAllocationsDTO]:
+    """Return memory allocations of sampled requests per route.
+
+    Args:
+        allocation_tracker: A tracker that measures allocations of requests.
+
+    Returns:
+        Allocations per route, the routes that retained the most memory come
+        first.
+    """
+    return [
+        dtos.RouteAllocationsDTO(**route_allocations.dict())
+        for route_allocations in allocation_tracker.report()
+    ]
+
+
+@admin_router.post("/profile")
+@di_wiring.inject
+async def open_profiling_window(
+    window: dtos.ProfilingWindowDTO,
+    profiler: profiling.SamplingProfiler = fa.Depends(
+        di_wiring.Provide[di_c.Container.profiler]
+    ),
+) -> dtos.ProfilingWindowDTO:
+    """Profile a share of all requests for a while.
+
+    Args:
+        window: How long to profile requests, and which share of them.
+        profiler: A profiler that samples requests.
+
+    Returns:
+        The opened profiling window.
+
+    Raises:
+        HTTPException: if the profiler is not running.
+    """
+    if not profiler.started:
+        raise fa.HTTPException(
+            status_code=http_status.HTTP_409_CONFLICT,
+            detail="Profiling is disabled",
+        )
+    profiler.open_window(duration=window.duration, sample_rate=window.sample_rate)
+    return window
+
+
+@admin_router.get("/profile", response_class=fa_resp.PlainTextResponse)
+@di_wiring.inject
+async def return_profile(
+    route: t.Optional[str] = None,
+    clear: bool = False,
+    profiler: profiling.SamplingProfiler = fa.Depends(
+        di_wiring.Provide[di_c.Container.profiler]
+    ),
+) -> str:
+    """Return sampled stacks of profiled requests as a flame graph input.
+
+    Args:
+        route: The path template of the route to report, all routes if not
+            set.
+        clear: Whether to drop the reported samples.
+        profiler: A profiler that samples requests.
+
+    Returns:
+        Sampled stacks in the collapsed format, rooted at their routes.
+    """
+    stacks = profiler.collapsed_stacks(route)
+    if clear:
+        profiler.clear()
+    return stacks
@@ -1,29 +1,33 @@
 """Handlers for the FastAPI events."""
-import databases
 import dependency_injector.wiring as di_wiring
 
 import {{cookiecutter.service_name}}._containers as svc_containers
+import {{cookiecutter.service_name}}._sharding as sharding
 
 
 @di_wiring.inject
 async def connect_database(
-    db: databases.Database = di_wiring.Provide[svc_containers.Container.db],
+    shard_router: sharding.ShardRouter = di_wiring.Provide[
+        svc_containers.Container.shard_router
+    ],
 ) -> None:
-    """Connect to the database instance, given the `db` object.
+    """Connect to all database shards.
 
     Args:
-        db: The database object that abstracts the database connection.
+        shard_router: The router that holds the databases of the shards.
     """
-    await db.connect()
+    await shard_router.connect()
 
 
 @di_wiring.inject
 async def disconnect_database(
-    db: databases.Database = di_wiring.Provide[svc_containers.Container.db],
+    shard_router: sharding.ShardRouter = di_wiring.Provide[
+        svc_containers.Container.shard_router
+    ],
 ) -> None:
-    """Disconnect from the database instance, given the `db` object.
+    """Disconnect from all database shards.
 
     Args:
-        db: The database object that abstracts the database connection.
+        shard_router: The router that holds the databases of the shards.
     """
-    await db.disconnect()
+    await shard_router.disconnect()
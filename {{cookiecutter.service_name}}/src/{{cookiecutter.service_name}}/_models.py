@@ -12,3 +12,27 @@ class HealthCheck(pyd.BaseModel):
 
     id: pyd.UUID4
     status: t.Literal["ok"]
+
+
+class AllocationSite(pyd.BaseModel):
+    """A source line that allocated memory during sampled requests."""
+
+    filename: str
+    lineno: int
+    size_bytes: int
+    blocks: int
+
+
+class RouteAllocations(pyd.BaseModel):
+    """Memory allocations of sampled requests to a route.
+
+    Retained allocations are the ones that were still alive once a request
+    finished, the peak includes short-lived allocations too.
+    """
+
+    route: str
+    sampled_requests: int
+    retained_blocks: int
+    retained_bytes: int
+    peak_bytes: int
+    top_sites: list[AllocationSite]
@@ -0,0 +1,271 @@
+"""On-demand sampling profiler for live requests.
+
+While profiled requests run, a `SIGPROF` timer interrupts the process every
+time it spends the sampling interval on the CPU and records the Python stack
+that runs at that moment. Samples are attributed to the route of the request
+whose context they were taken in, so concurrent requests that are not profiled
+do not pollute the results.
+
+Stacks are reported in the collapsed format that flame graph tools, like
+`flamegraph.pl` or speedscope, read: one line per unique stack, with frames
+separated by semicolons and followed by the number of samples.
+"""
+import collections
+import collections.abc as col_abc
+import contextlib
+import contextvars
+import logging
+import random
+import secrets
+import signal
+import time
+import types
+import typing as t
+
+import pydantic as pyd
+import starlette.datastructures as st_ds
+import starlette.types as st_types
+
+import {{cookiecutter.service_name}}._routing as routing
+
+logger = logging.getLogger(__name__)
+
+# The route of the profiled request that runs in the current context. Tasks
+# that a request spawns inherit the context, so their samples count too
+_profiled_route: contextvars.ContextVar[t.Optional[str]] = contextvars.ContextVar(
+    "profiled_route", default=None
+)
+
+AdminTokenGetter = t.Callable[[], t.Optional[pyd.SecretStr]]
+
+
+class SamplingProfiler:
+    """Samples stacks of profiled requests per route.
+
+    The timer only runs while profiled requests are in flight, so profiling
+    costs nothing otherwise. Signal handlers can only be set in the main
+    thread, which is where the event loop of the application runs.
+    """
+
+    def __init__(self, *, sample_interval: float) -> None:
+        """Create a sampling profiler.
+
+        Args:
+            sample_interval: CPU time between samples, in seconds.
+        """
+        self._sample_interval = sample_interval
+        self._stacks: dict[str, collections.Counter[str]] = {}
+        self._active_profiles = 0
+        self._window_ends_at = 0.0
+        self._window_sample_rate = 0.0
+        self._previous_handler: t.Any = None
+        self._started = False
+        self._sampling_paused = False
+
+    def start(self) -> None:
+        """Install the sampling signal handler."""
+        try:
+            self._previous_handler = signal.signal(signal.SIGPROF, self._sample)
+        except (AttributeError, ValueError):  # pragma: no cover
+            # There is no `SIGPROF` on Windows, and no signal handlers outside
+            # the main thread
+            logger.warning("Sampling profiler is not available in this process")
+            return
+        self._started = True
+
+    def stop(self) -> None:
+        """Stop sampling and restore the previous signal handler."""
+        if not self._started:
+            return
+        signal.setitimer(signal.ITIMER_PROF, 0)
+        signal.signal(signal.SIGPROF, self._previous_handler)
+        self._started = False
+
+    def open_window(self, *, duration: float, sample_rate: float) -> None:
+        """Profile a share of all requests for a while.
+
+        Args:
+            duration: How long the window stays open, in seconds.
+            sample_rate: The share of requests that will be profiled.
+        """
+        self._window_ends_at = time.monotonic() + duration
+        self._window_sample_rate = sample_rate
+
+    def should_profile(self) -> bool:
+        """Decide whether a request that did not ask for profiling is profiled.
+
+        Returns:
+            Whether the request should be profiled.
+        """
+        if not self._started or time.monotonic() >= self._window_ends_at:
+            return False
+        # Sampling does not need to be cryptographically secure
+        return random.random() < self._window_sample_rate  # noqa: S311
+
+    @property
+    def started(self) -> bool:
+        """Whether the profiler can sample requests.
+
+        Returns:
+            `True` if the sampling signal handler is installed.
+        """
+        return self._started
+
+    @contextlib.contextmanager
+    def profile(self, route: str) -> col_abc.Iterator[None]:
+        """Sample stacks of the code that runs inside the context.
+
+        Args:
+            route: The route the samples will be attributed to.
+
+        Yields:
+            Control to the profiled code.
+        """
+        token = _profiled_route.set(route)
+        self._active_profiles += 1
+        if self._active_profiles == 1:
+            signal.setitimer(
+                signal.ITIMER_PROF, self._sample_interval, self._sample_interval
+            )
+        try:
+            yield
+        finally:
+            self._active_profiles -= 1
+            if not self._active_profiles:
+                signal.setitimer(signal.ITIMER_PROF, 0)
+            _profiled_route.reset(token)
+
+    def collapsed_stacks(self, route: t.Optional[str] = None) -> str:
+        """Report sampled stacks in the collapsed format.
+
+        Args:
+            route: The route to report, `None` to report all of them. Every
+                stack starts with the frame of its route.
+
+        Returns:
+            Lines of semicolon-separated frames followed by sample counts.
+        """
+        # The request that asks for the report may be profiled itself, so the
+        # stacks are copied before the signal handler can change them again
+        with self._paused_sampling():
+            collected_stacks = {
+                stack_route: dict(stacks)
+                for stack_route, stacks in self._stacks.items()
+                if route is None or stack_route == route
+            }
+
+        lines = [
+            f"{stack_route};{stack} {count}"
+            for stack_route, stacks in sorted(collected_stacks.items())
+            for stack, count in sorted(stacks.items())
+        ]
+        return "".join(f"{line}\n" for line in lines)
+
+    def clear(self) -> None:
+        """Drop the samples collected so far."""
+        self._stacks.clear()
+
+    @contextlib.contextmanager
+    def _paused_sampling(self) -> col_abc.Iterator[None]:
+        """Drop samples while the collected ones are read.
+
+        The signal handler runs in the main thread between any two bytecodes,
+        including the ones that iterate the collected stacks. Blocking the
+        signal is not enough, since other threads may still receive it.
+
+        Yields:
+            Control to the code that reads the samples.
+        """
+        self._sampling_paused = True
+        try:
+            yield
+        finally:
+            self._sampling_paused = False
+
+    def _sample(self, signum: int, frame: t.Optional[types.FrameType]) -> None:
+        """Record the stack that was running when the timer fired.
+
+        Args:
+            signum: The number of the received signal.
+            frame: The frame that was interrupted by the signal.
+        """
+        route = _profiled_route.get()
+        if route is None or frame is None or self._sampling_paused:
+            return
+
+        frames = []
+        while frame is not None:
+            module = frame.f_globals.get("__name__", "?")
+            frames.append(f"{frame.f_code.co_name} ({module})")
+            frame = frame.f_back
+        stack = ";".join(reversed(frames))
+        self._stacks.setdefault(route, collections.Counter())[stack] += 1
+
+
+class ProfilingMiddleware:
+    """An ASGI middleware that profiles requests.
+
+    A request is profiled if it asks for it with the profiling header and the
+    admin token, or if it is sampled while a profiling window is open.
+    """
+
+    def __init__(
+        self,
+        app: st_types.ASGIApp,
+        *,
+        profiler: SamplingProfiler,
+        header_name: str,
+        admin_token: AdminTokenGetter,
+    ) -> None:
+        """Create a profiling middleware.
+
+        Args:
+            app: The wrapped ASGI application.
+            profiler: The profiler that samples requests.
+            header_name: The request header that asks for profiling.
+            admin_token: Returns the configured admin token.
+        """
+        self._app = app
+        self._profiler = profiler
+        self._header_name = header_name
+        self._admin_token = admin_token
+
+    async def __call__(
+        self, scope: st_types.Scope, receive: st_types.Receive, send: st_types.Send
+    ) -> None:
+        """Handle an ASGI connection.
+
+        Args:
+            scope: The connection scope.
+            receive: A callable that receives ASGI events.
+            send: A callable that sends ASGI events.
+        """
+        if scope["type"] != "http" or not self._should_profile(scope):
+            await self._app(scope, receive, send)
+            return
+
+        with self._profiler.profile(routing.route_path(scope)):
+            await self._app(scope, receive, send)
+
+    def _should_profile(self, scope: st_types.Scope) -> bool:
+        """Decide whether a request is profiled.
+
+        Args:
+            scope: The connection scope of the request.
+
+        Returns:
+            Whether the request should be profiled.
+        """
+        if not self._profiler.started:
+            return False
+
+        headers = st_ds.Headers(scope=scope)
+        if self._header_name in headers:
+            admin_token = self._admin_token()
+            presented_token = headers.get("X-Admin-Token")
+            if admin_token is None or presented_token is None:
+                return False
+            return secrets.compare_digest(
+                presented_token, admin_token.get_secret_value()
+            )
+        return self._profiler.should_profile()
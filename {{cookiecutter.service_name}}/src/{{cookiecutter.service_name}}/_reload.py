@@ -0,0 +1,212 @@
+"""Reloading the configuration while the application runs.
+
+The config file of the current application environment is watched for changes
+and is also reloaded on `SIGHUP`. A reloaded config is validated before it is
+applied, so a broken file leaves the running application intact.
+"""
+import asyncio
+import contextlib
+import logging
+import os
+import pathlib
+import signal
+import typing as t
+
+import pydantic as pyd
+import yaml
+
+import {{cookiecutter.service_name}}._containers as svc_containers
+import {{cookiecutter.service_name}}._sharding as sharding
+import {{cookiecutter.service_name}}.config as svc_cfg
+
+logger = logging.getLogger(__name__)
+
+# Settings that define the database shards and their connection pools, the
+# pools are replaced when they change
+_POOL_SETTINGS: t.Final[tuple[str, ...]] = (
+    "database_dsn",
+    "database_shard_dsns",
+    "database_pool",
+)
+# Settings that are read once, while the application is created
+_RESTART_REQUIRED_SETTINGS: t.Final[tuple[str, ...]] = (
+    "compression",
+    "allocation_tracking",
+    "profiling",
+    "tracing",
+    "warmup",
+)
+
+ConfigLoader = t.Callable[[], svc_cfg.Config]
+
+
+class ConfigReloader:
+    """Applies changes of the config to a live dependency injection container.
+
+    Settings that consumers read through the container's `config` provider
+    take effect on the next request. Changed connection pools are replaced by
+    new ones: new requests use the new pools, while the old ones are closed
+    after the drain timeout, so requests in flight are not interrupted.
+    """
+
+    def __init__(
+        self,
+        container: svc_containers.Container,
+        *,
+        config_path: t.Optional[pathlib.Path] = None,
+        load_config: ConfigLoader = svc_cfg.Config,
+    ) -> None:
+        """Create a config reloader.
+
+        Args:
+            container: The container that the reloaded config is applied to.
+            config_path: The config file to watch. Only `SIGHUP` triggers
+                reloads if it is not set.
+            load_config: Loads and validates the config.
+        """
+        self._container = container
+        self._config_path = config_path
+        self._load_config = load_config
+        self._config_mtime = self._get_config_mtime()
+        self._watch_task: t.Optional[asyncio.Task] = None
+        self._draining_routers: dict[asyncio.Task, sharding.ShardRouter] = {}
+        self._overrides_db = False
+
+    async def start(self) -> None:
+        """Start watching the config file and listening to `SIGHUP`."""
+        reload_requested = asyncio.Event()
+        with contextlib.suppress(NotImplementedError, RuntimeError):
+            # Signal handlers are only available in the main thread on Unix
+            asyncio.get_running_loop().add_signal_handler(
+                signal.SIGHUP, reload_requested.set
+            )
+        self._watch_task = asyncio.create_task(self._watch(reload_requested))
+
+    async def stop(self) -> None:
+        """Stop watching and close replaced connection pools right away."""
+        with contextlib.suppress(NotImplementedError, RuntimeError):
+            asyncio.get_running_loop().remove_signal_handler(signal.SIGHUP)
+
+        # Replaced databases that are still draining are disconnected here,
+        # after their drain tasks are cancelled
+        draining_routers = list(self._draining_routers.values())
+        tasks = list(self._draining_routers)
+        if self._watch_task is not None:
+            tasks.append(self._watch_task)
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+        for router in draining_routers:
+            await router.disconnect()
+
+    async def reload(self) -> bool:
+        """Reload the config and apply it to the container.
+
+        Returns:
+            Whether the reloaded config has been applied.
+        """
+        try:
+            new_config = self._load_config()
+        except (OSError, yaml.YAMLError, pyd.ValidationError):
+            logger.exception("The reloaded config is invalid, keeping the current one")
+            return False
+        except Exception:
+            # Files that are not YAML mappings, like files that editors have
+            # truncated before writing them, fail while config sources merge
+            logger.exception("Cannot load the reloaded config, keeping the current one")
+            return False
+
+        current_settings = self._container.config()
+        new_settings = new_config.dict()
+        changed = {
+            name
+            for name, value in new_settings.items()
+            if current_settings.get(name) != value
+        }
+
+        if changed & set(_POOL_SETTINGS):
+            try:
+                await self._replace_databases(new_config)
+            except Exception:
+                logger.exception("Cannot connect a new database pool")
+                return False
+
+        # Loading a config merges it into the current one, so settings removed
+        # from the file would stay in effect without dropping it first
+        self._container.config.reset_override()
+        self._container.config.from_pydantic(new_config)
+        for name in sorted(changed & set(_RESTART_REQUIRED_SETTINGS)):
+            logger.warning("Changes to %r take effect after a restart", name)
+        logger.info("Reloaded the config, changed settings: %s", sorted(changed))
+        return True
+
+    async def _watch(self, reload_requested: asyncio.Event) -> None:
+        """Reload the config on request and when the config file changes.
+
+        Errors are logged and watching goes on, so that a single failed reload
+        does not stop later changes from being applied.
+
+        Args:
+            reload_requested: An event that is set when a reload is requested.
+        """
+        while True:
+            poll_interval = self._container.config.config_reload.poll_interval()
+            with contextlib.suppress(asyncio.TimeoutError):
+                await asyncio.wait_for(reload_requested.wait(), poll_interval)
+
+            config_mtime = self._get_config_mtime()
+            if reload_requested.is_set() or config_mtime != self._config_mtime:
+                reload_requested.clear()
+                self._config_mtime = config_mtime
+                try:
+                    await self.reload()
+                except Exception:
+                    logger.exception("Reloading the config failed")
+
+    def _get_config_mtime(self) -> t.Optional[int]:
+        """Return the modification time of the watched config file.
+
+        Returns:
+            The modification time in nanoseconds, `None` if there is no file.
+        """
+        if self._config_path is None:
+            return None
+        try:
+            return os.stat(self._config_path).st_mtime_ns
+        except OSError:
+            return None
+
+    async def _replace_databases(self, new_config: svc_cfg.Config) -> None:
+        """Connect new pools of all shards and route new requests to them.
+
+        Args:
+            new_config: The config the new pools are created from.
+        """
+        # A staging container builds the pools exactly the way the live one
+        # does, without touching the live config before the pools connect
+        staging_container = svc_containers.Container()
+        staging_container.config.from_pydantic(new_config)
+        new_router = staging_container.shard_router()
+        await new_router.connect()
+
+        old_router = self._container.shard_router()
+        if self._overrides_db:
+            self._container.db.reset_last_overriding()
+            self._container.shard_router.reset_last_overriding()
+        self._container.db.override(staging_container.db())
+        self._container.shard_router.override(new_router)
+        self._overrides_db = True
+
+        drain_task = asyncio.create_task(self._disconnect_after_drain(old_router))
+        self._draining_routers[drain_task] = old_router
+        drain_task.add_done_callback(self._draining_routers.pop)
+
+    async def _disconnect_after_drain(self, router: sharding.ShardRouter) -> None:
+        """Disconnect replaced shards once requests in flight are done.
+
+        Args:
+            router: The router of the replaced shards.
+        """
+        await asyncio.sleep(self._container.config.config_reload.drain_timeout())
+        await router.disconnect()
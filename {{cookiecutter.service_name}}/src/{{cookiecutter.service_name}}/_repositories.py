@@ -3,47 +3,141 @@
 Repositories interact with the data access layer.
 """
 import collections.abc as col_abc
+import contextlib
 import typing as t
+import uuid
 
 import databases
 
+import {{cookiecutter.service_name}}._deadlines as dl
 import {{cookiecutter.service_name}}._models as mdl
+import {{cookiecutter.service_name}}._sharding as sharding
 import {{cookiecutter.service_name}}._tables as tbl
+import {{cookiecutter.service_name}}._tracing as tracing
+
+# A statement with values of its bind parameters
+Statement = tuple[t.Any, t.Optional[dict[str, t.Any]]]
+
+
+@contextlib.contextmanager
+def _statement_span(name: str, statement: t.Any) -> col_abc.Iterator[None]:
+    """Trace a database statement as a client span.
+
+    Args:
+        name: The name of the span, like the SQL operation and its table.
+        statement: The statement.
+
+    Yields:
+        Control to the code that runs the statement.
+    """
+    with tracing.span(name, kind=tracing.SpanKind.CLIENT) as span:
+        if span is not None:
+            # Statements are compiled to SQL for traced requests only
+            span.set_attribute("db.system", "postgresql")
+            span.set_attribute("db.statement", str(statement))
+        yield
 
 
 class IHealthCheckRepository(t.Protocol):
     """A protocol for healthcheck repositories."""
 
-    async def create(self) -> mdl.HealthCheck:
-        """Create the healthcheck."""
+    async def create(
+        self, *, deadline: t.Optional[dl.Deadline] = None
+    ) -> mdl.HealthCheck:
+        """Create the healthcheck.
+
+        Args:
+            deadline: The deadline of the statement.
+        """
+
+
+class ShardedRepository:
+    """A repository whose rows are spread across database shards.
+
+    Subclasses declare the column that holds the shard key of their rows.
+    Statements about a single row run on the shard of its key, so rows whose
+    keys are generated by the database have to get them client-side instead.
+    """
+
+    shard_key: t.ClassVar[str]
+
+    def __init__(self, router: sharding.ShardRouter) -> None:
+        """Create a sharded repository.
+
+        Args:
+            router: Routes statements to the shards.
+        """
+        self._router = router
+
+    def _shard_for(self, row: col_abc.Mapping[str, t.Any]) -> databases.Database:
+        """Return the database of the shard that stores a row.
 
+        Args:
+            row: Values of the row's columns, including its shard key.
 
-class HealthCheckRepository:
+        Returns:
+            The database of the shard.
+        """
+        return self._router.shard_for(row[self.shard_key])
+
+
+class HealthCheckRepository(ShardedRepository):
     """A concreate healthcheck repository.
 
     Uses an RDBMS as a storage engine.
     """
 
-    def __init__(self, db: databases.Database, *, table=tbl.healthchecks) -> None:
+    shard_key = "id"
+
+    def __init__(self, router: sharding.ShardRouter, *, table=tbl.healthchecks) -> None:
         """Create a healthcheck repository.
 
         Args:
-            db: The database the repo will interact with.
+            router: Routes statements to the shards of the healthchecks.
             table: The SQL table that defines the healthcheck data.
         """
-        self._db = db
+        super().__init__(router)
         self._table = table
 
-    async def create(self) -> mdl.HealthCheck:
+    async def create(
+        self, *, deadline: t.Optional[dl.Deadline] = None
+    ) -> mdl.HealthCheck:
         """Create the healthcheck.
 
+        Args:
+            deadline: The deadline of the statement.
+
         Returns:
             The created healthcheck.
         """
-        insert_query = self._table.insert().values(status="ok").returning(self._table)
-        created_healthcheck = await self._db.fetch_one(insert_query)
+        insert_query = self._make_insert_query()
+        values = {"id": uuid.uuid4()}
+        db = self._shard_for(values)
+        with tracing.span("HealthCheckRepository.create"):
+            with _statement_span(f"INSERT {self._table.name}", insert_query):
+                # A statement cancelled by the deadline is cancelled on the
+                # server as well, without a round trip to set its timeout
+                created_healthcheck = await dl.wait_for(
+                    db.fetch_one(insert_query, values), deadline
+                )
 
         # After a successful insert, the row is guaranteed to exist
         created_healthcheck = t.cast(col_abc.Mapping[str, t.Any], created_healthcheck)
 
         return mdl.HealthCheck(**created_healthcheck)
+
+    def statements(self) -> list[Statement]:
+        """Return the statements the repository runs.
+
+        Returns:
+            The statements with sample values, to prepare them in advance.
+        """
+        return [(self._make_insert_query(), {"id": uuid.uuid4()})]
+
+    def _make_insert_query(self) -> t.Any:
+        """Return the statement that inserts a healthcheck.
+
+        Returns:
+            The statement.
+        """
+        return self._table.insert().values(status="ok").returning(self._table)
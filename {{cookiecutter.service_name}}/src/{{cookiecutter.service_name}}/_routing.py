@@ -0,0 +1,28 @@
+"""Routing helpers for ASGI middleware."""
+import typing as t
+
+import starlette.routing as st_routing
+import starlette.types as st_types
+
+UNMATCHED_ROUTE: t.Final[str] = "<unmatched>"
+
+
+def route_path(scope: st_types.Scope) -> str:
+    """Return the path template of the route that will handle a request.
+
+    Middleware runs before the router, so the route is matched the same way
+    the router would do it. Path templates are used instead of request paths
+    to keep the number of distinct routes bounded.
+
+    Args:
+        scope: The connection scope.
+
+    Returns:
+        The path template of the matching route, like `/users/{user_id}`.
+    """
+    app = scope.get("app")
+    for route in getattr(app, "routes", []):
+        match, _ = route.matches(scope)
+        if match == st_routing.Match.FULL:
+            return getattr(route, "path", UNMATCHED_ROUTE)
+    return UNMATCHED_ROUTE
@@ -5,8 +5,12 @@ clients. Only services should be exposed to external ports and adapters, like
 REST, GraphQL or other APIs.
 """
 
+import typing as t
+
+import {{cookiecutter.service_name}}._deadlines as dl
 import {{cookiecutter.service_name}}._models as mdl
 import {{cookiecutter.service_name}}._repositories as repos
+import {{cookiecutter.service_name}}._tracing as tracing
 
 
 class HealthService:
@@ -24,10 +28,16 @@ class HealthService:
         """
         self._repo = repo
 
-    async def get_healthcheck(self) -> mdl.HealthCheck:
+    async def get_healthcheck(
+        self, *, deadline: t.Optional[dl.Deadline] = None
+    ) -> mdl.HealthCheck:
         """Get a healthcheck.
 
+        Args:
+            deadline: The deadline of the healthcheck.
+
         Returns:
             The performed healthcheck.
         """
-        return await self._repo.create()
+        with tracing.span("HealthService.get_healthcheck"):
+            return await self._repo.create(deadline=deadline)
@@ -0,0 +1,202 @@
+"""Spreading rows across database shards.
+
+Each shard is a separate database with its own connection pool. Rows are
+assigned to shards by consistent hashing of their shard keys: every shard
+owns many points on a hash ring, and a key belongs to the shard that owns the
+first point at or after the key's hash. Adding a shard reassigns only the
+keys that the new shard takes over, instead of reshuffling all of them.
+
+Rebalancing is manual: nothing moves existing rows between shards. Before a
+shard is added, rows whose keys move to it have to be copied there and then
+deleted from their old shards. `ShardRouter.shard_name_for()` of a router that
+includes the new shard tells which keys move.
+
+Queries for a single key run on its shard, while queries that are not limited
+to a key fan out to all shards at once and merge their results.
+"""
+import asyncio
+import bisect
+import collections.abc as col_abc
+import hashlib
+import typing as t
+import urllib.parse
+import uuid
+
+import databases
+
+# Keys are hashed by their string representation
+ShardKey = t.Union[str, int, uuid.UUID]
+_T = t.TypeVar("_T")
+
+# Points every shard owns on the hash ring. More points spread keys more
+# evenly, at the cost of a larger ring
+DEFAULT_VIRTUAL_NODES: t.Final[int] = 128
+
+
+class DuplicateShardError(ValueError):
+    """Several shards point to the same database."""
+
+
+def _hash(value: str) -> int:
+    """Return a stable 64-bit hash of a value.
+
+    Unlike `hash()`, the result does not change between processes.
+
+    Args:
+        value: The value.
+
+    Returns:
+        The hash.
+    """
+    digest = hashlib.blake2b(value.encode(), digest_size=8).digest()
+    return int.from_bytes(digest, "big")
+
+
+def shard_name(dsn: str) -> str:
+    """Return the name of the shard a DSN points to.
+
+    The name does not include credentials and options, so rotating passwords
+    does not move keys between shards.
+
+    Args:
+        dsn: The DSN of the shard.
+
+    Returns:
+        The host, port and database name of the shard.
+    """
+    url = urllib.parse.urlsplit(dsn)
+    return f"{url.hostname}:{url.port or 5432}{url.path or '/'}"
+
+
+class ShardRouter:
+    """Routes queries to database shards by consistent hashing of keys."""
+
+    def __init__(
+        self,
+        shards: col_abc.Mapping[str, databases.Database],
+        *,
+        virtual_nodes: int = DEFAULT_VIRTUAL_NODES,
+    ) -> None:
+        """Create a shard router.
+
+        Args:
+            shards: Databases of the shards by their names. Keys are assigned
+                to shards by names, so they should not change.
+            virtual_nodes: How many points every shard owns on the hash ring.
+
+        Raises:
+            ValueError: if there are no shards.
+        """
+        if not shards:
+            raise ValueError("At least one shard is required")
+
+        self._shards = dict(shards)
+        ring = sorted(
+            (_hash(f"{name}#{node}"), name)
+            for name in self._shards
+            for node in range(virtual_nodes)
+        )
+        self._ring_points = [point for point, _ in ring]
+        self._ring_names = [name for _, name in ring]
+
+    @classmethod
+    def from_dsns(
+        cls,
+        *,
+        primary: databases.Database,
+        primary_dsn: str,
+        dsns: col_abc.Sequence[str],
+        pool_options: col_abc.Mapping[str, t.Any],
+    ) -> "ShardRouter":
+        """Create a router for a primary database and additional shards.
+
+        Args:
+            primary: The database of the first shard.
+            primary_dsn: The DSN of the first shard.
+            dsns: DSNs of the additional shards.
+            pool_options: Connection pool options of the additional shards.
+
+        Returns:
+            The shard router.
+
+        Raises:
+            DuplicateShardError: if several DSNs point to the same database.
+        """
+        shards = {shard_name(primary_dsn): primary}
+        for dsn in dsns:
+            name = shard_name(dsn)
+            if name in shards:
+                raise DuplicateShardError(f"Shard {name!r} is configured twice")
+            # Validated DSNs are `PostgresDsn` objects that `databases` cannot copy
+            shards[name] = databases.Database(str(dsn), **pool_options)
+        return cls(shards)
+
+    @property
+    def shards(self) -> list[databases.Database]:
+        """Databases of all shards.
+
+        Returns:
+            The databases.
+        """
+        return list(self._shards.values())
+
+    def shard_name_for(self, key: ShardKey) -> str:
+        """Return the name of the shard that a key belongs to.
+
+        Args:
+            key: The shard key, like the ID of an entity.
+
+        Returns:
+            The name of the shard.
+        """
+        index = bisect.bisect_left(self._ring_points, _hash(str(key)))
+        # Keys past the last point belong to the first one, closing the ring
+        return self._ring_names[index % len(self._ring_names)]
+
+    def shard_for(self, key: ShardKey) -> databases.Database:
+        """Return the database of the shard that a key belongs to.
+
+        Args:
+            key: The shard key, like the ID of an entity.
+
+        Returns:
+            The database of the shard.
+        """
+        return self._shards[self.shard_name_for(key)]
+
+    async def connect(self) -> None:
+        """Connect to all shards."""
+        await self.fan_out(lambda db: db.connect())
+
+    async def disconnect(self) -> None:
+        """Disconnect from all shards."""
+        await self.fan_out(lambda db: db.disconnect())
+
+    async def fan_out(
+        self, query: t.Callable[[databases.Database], col_abc.Awaitable[_T]]
+    ) -> list[_T]:
+        """Run a query on all shards concurrently.
+
+        Args:
+            query: Runs the query on the database of a shard.
+
+        Returns:
+            Results of the shards, in the order of the shards.
+        """
+        return list(await asyncio.gather(*(query(db) for db in self._shards.values())))
+
+    async def fetch_all(
+        self, query: t.Any, values: t.Optional[dict[str, t.Any]] = None
+    ) -> list[t.Any]:
+        """Fetch rows from all shards concurrently.
+
+        Args:
+            query: The query.
+            values: Values of the query's bind parameters.
+
+        Returns:
+            Rows of all shards. Rows are grouped by shards, so queries that
+            need a global order should sort the merged rows.
+        """
+        shard_rows = await self.fan_out(lambda db: db.fetch_all(query, values))
+        return [row for rows in shard_rows for row in rows]
@@ -0,0 +1,725 @@
+"""Distributed tracing.
+
+Spans follow the OpenTelemetry data model and are exported as OTLP JSON trace
+export requests, which the OpenTelemetry collector reads with its OTLP JSON
+file receiver. Trace context is taken from the W3C `traceparent` and
+`tracestate` request headers.
+
+Only a server span is started explicitly, for every sampled request. Spans
+of the inner layers are started with `span()`, which becomes a no-op unless a
+sampled span is current, so the layers do not need a tracer and unsampled
+requests cost only a context variable lookup per span. The trace context of
+unsampled callers is still propagated, with the sampled flag cleared.
+"""
+import collections
+import collections.abc as col_abc
+import contextvars
+import enum
+import logging
+import pathlib
+import random
+import re
+import secrets
+import threading
+import time
+import types
+import typing as t
+
+import orjson
+import starlette.datastructures as st_ds
+import starlette.types as st_types
+
+import {{cookiecutter.service_name}}._routing as routing
+
+logger = logging.getLogger(__name__)
+
+# version-trace_id-parent_id-trace_flags, versions after `00` may add fields
+_TRACEPARENT_PATTERN: t.Final = re.compile(
+    r"(?P<version>[0-9a-f]{2})-(?P<trace_id>[0-9a-f]{32})-"
+    r"(?P<span_id>[0-9a-f]{16})-(?P<trace_flags>[0-9a-f]{2})(?P<rest>-.*)?"
+)
+_INVALID_TRACE_ID: t.Final[str] = "0" * 32
+_INVALID_SPAN_ID: t.Final[str] = "0" * 16
+_SAMPLED_FLAG: t.Final[int] = 0x01
+# The instrumentation scope of spans started by the service itself
+_SCOPE_NAME: t.Final[str] = "{{cookiecutter.service_name}}"
+
+DEFAULT_MAX_QUEUED_SPANS: t.Final[int] = 2048
+DEFAULT_FLUSH_INTERVAL: t.Final[float] = 1.0
+
+AttributeValue = t.Union[str, bool, int, float]
+
+_current_span: contextvars.ContextVar[t.Optional["Span"]] = contextvars.ContextVar(
+    "current_span", default=None
+)
+# The context of the caller of an unsampled request, which no span records
+_unsampled_context: contextvars.ContextVar[
+    t.Optional["SpanContext"]
+] = contextvars.ContextVar("unsampled_context", default=None)
+
+
+class SpanKind(enum.Enum):
+    """The role of a span in a trace.
+
+    Values are the ones of the OTLP enum, which OTLP JSON encodes as integers.
+    """
+
+    INTERNAL = 1
+    SERVER = 2
+    CLIENT = 3
+
+
+class StatusCode(enum.Enum):
+    """The outcome of the operation a span represents.
+
+    Values are the ones of the OTLP enum, which OTLP JSON encodes as integers.
+    """
+
+    UNSET = 0
+    OK = 1
+    ERROR = 2
+
+
+class SpanContext(t.NamedTuple):
+    """Identifies a span within a trace, propagated across services."""
+
+    trace_id: str
+    span_id: str
+    sampled: bool
+    trace_state: str = ""
+
+
+def parse_traceparent(
+    traceparent: str, trace_state: str = ""
+) -> t.Optional[SpanContext]:
+    """Parse a W3C `traceparent` header.
+
+    Args:
+        traceparent: The value of the header.
+        trace_state: The value of the `tracestate` header.
+
+    Returns:
+        The context of the remote parent span, `None` if the header is invalid.
+    """
+    match = _TRACEPARENT_PATTERN.fullmatch(traceparent.strip())
+    if match is None:
+        return None
+    version = match["version"]
+    if version == "ff" or (version == "00" and match["rest"] is not None):
+        return None
+    if match["trace_id"] == _INVALID_TRACE_ID or match["span_id"] == _INVALID_SPAN_ID:
+        return None
+    return SpanContext(
+        trace_id=match["trace_id"],
+        span_id=match["span_id"],
+        sampled=bool(int(match["trace_flags"], 16) & _SAMPLED_FLAG),
+        trace_state=trace_state,
+    )
+
+
+def format_traceparent(context: SpanContext) -> str:
+    """Format a span context as a W3C `traceparent` header.
+
+    Args:
+        context: The span context.
+
+    Returns:
+        The value of the header.
+    """
+    trace_flags = _SAMPLED_FLAG if context.sampled else 0
+    return f"00-{context.trace_id}-{context.span_id}-{trace_flags:02x}"
+
+
+class Span:
+    """A timed operation within a trace."""
+
+    def __init__(
+        self,
+        name: str,
+        *,
+        tracer: "Tracer",
+        context: SpanContext,
+        parent_span_id: t.Optional[str] = None,
+        kind: SpanKind = SpanKind.INTERNAL,
+        attributes: t.Optional[col_abc.Mapping[str, AttributeValue]] = None,
+    ) -> None:
+        """Start a span.
+
+        Args:
+            name: The name of the operation.
+            tracer: The tracer that exports the span once it ends.
+            context: The context of the span.
+            parent_span_id: The ID of the parent span, `None` for root spans.
+            kind: The role of the span in the trace.
+            attributes: Attributes that describe the operation.
+        """
+        self.name = name
+        self.tracer = tracer
+        self.context = context
+        self.parent_span_id = parent_span_id
+        self.kind = kind
+        self.attributes: dict[str, AttributeValue] = dict(attributes or {})
+        self.events: list[dict[str, t.Any]] = []
+        self.status_code = StatusCode.UNSET
+        self.status_message = ""
+        self.start_time_ns = time.time_ns()
+        self.end_time_ns: t.Optional[int] = None
+
+    def set_attribute(self, key: str, value: AttributeValue) -> None:
+        """Set an attribute of the span.
+
+        Args:
+            key: The attribute name.
+            value: The attribute value.
+        """
+        self.attributes[key] = value
+
+    def set_status(self, status_code: StatusCode, message: str = "") -> None:
+        """Set the outcome of the operation.
+
+        Args:
+            status_code: The outcome.
+            message: A description of the outcome.
+        """
+        self.status_code = status_code
+        self.status_message = message
+
+    def record_exception(self, exc: BaseException) -> None:
+        """Record an exception raised during the operation.
+
+        Args:
+            exc: The exception.
+        """
+        self.events.append(
+            {
+                "name": "exception",
+                "time_ns": time.time_ns(),
+                "attributes": {
+                    "exception.type": type(exc).__qualname__,
+                    "exception.message": str(exc),
+                },
+            }
+        )
+        self.set_status(StatusCode.ERROR, f"{type(exc).__qualname__}: {exc}")
+
+    def end(self) -> None:
+        """End the span and export it."""
+        if self.end_time_ns is not None:
+            return
+        self.end_time_ns = time.time_ns()
+        self.tracer.export(self)
+
+    def to_otlp(self) -> dict[str, t.Any]:
+        """Return the span in the OTLP JSON format.
+
+        Returns:
+            The span as a JSON-serializable mapping.
+        """
+        span: dict[str, t.Any] = {
+            "traceId": self.context.trace_id,
+            "spanId": self.context.span_id,
+            "name": self.name,
+            "kind": self.kind.value,
+            "startTimeUnixNano": str(self.start_time_ns),
+            "endTimeUnixNano": str(self.end_time_ns),
+            "attributes": _to_otlp_attributes(self.attributes),
+            "events": [
+                {
+                    "name": event["name"],
+                    "timeUnixNano": str(event["time_ns"]),
+                    "attributes": _to_otlp_attributes(event["attributes"]),
+                }
+                for event in self.events
+            ],
+            "status": {"code": self.status_code.value},
+        }
+        if self.parent_span_id is not None:
+            span["parentSpanId"] = self.parent_span_id
+        if self.context.trace_state:
+            span["traceState"] = self.context.trace_state
+        if self.status_message:
+            span["status"]["message"] = self.status_message
+        return span
+
+
+def _to_otlp_attributes(
+    attributes: col_abc.Mapping[str, AttributeValue]
+) -> list[dict[str, t.Any]]:
+    """Convert span attributes to OTLP JSON key-values.
+
+    Args:
+        attributes: The attributes.
+
+    Returns:
+        The attributes as OTLP JSON key-values.
+    """
+    key_values = []
+    for key, value in attributes.items():
+        # `bool` is a subclass of `int`, so it is checked first
+        if isinstance(value, bool):
+            otlp_value: dict[str, t.Any] = {"boolValue": value}
+        elif isinstance(value, int):
+            # OTLP JSON encodes 64-bit integers as strings
+            otlp_value = {"intValue": str(value)}
+        elif isinstance(value, float):
+            otlp_value = {"doubleValue": value}
+        else:
+            otlp_value = {"stringValue": str(value)}
+        key_values.append({"key": key, "value": otlp_value})
+    return key_values
+
+
+def to_otlp_request(spans: col_abc.Iterable[Span]) -> dict[str, t.Any]:
+    """Wrap spans in an OTLP JSON trace export request.
+
+    Args:
+        spans: Ended spans.
+
+    Returns:
+        The request as a JSON-serializable mapping. Spans are grouped by the
+        resources of their tracers.
+    """
+    spans_by_tracer: dict[Tracer, list[dict[str, t.Any]]] = {}
+    for span in spans:
+        spans_by_tracer.setdefault(span.tracer, []).append(span.to_otlp())
+    return {
+        "resourceSpans": [
+            {
+                "resource": {"attributes": _to_otlp_attributes(tracer.resource)},
+                "scopeSpans": [{"scope": {"name": _SCOPE_NAME}, "spans": otlp_spans}],
+            }
+            for tracer, otlp_spans in spans_by_tracer.items()
+        ]
+    }
+
+
+class ISpanExporter(t.Protocol):
+    """A protocol for span exporters."""
+
+    def export(self, spans: col_abc.Sequence[Span]) -> None:
+        """Export ended spans.
+
+        Args:
+            spans: The spans.
+        """
+
+    def shutdown(self) -> None:
+        """Release the resources of the exporter."""
+
+
+class InMemorySpanExporter:
+    """Keeps the latest exported spans in memory, for tests and debugging."""
+
+    def __init__(self, *, max_spans: int = DEFAULT_MAX_QUEUED_SPANS) -> None:
+        """Create an in-memory span exporter.
+
+        Args:
+            max_spans: How many spans to keep, older spans are dropped.
+        """
+        self.spans: collections.deque[Span] = collections.deque(maxlen=max_spans)
+
+    def export(self, spans: col_abc.Sequence[Span]) -> None:
+        """Keep ended spans.
+
+        Args:
+            spans: The spans.
+        """
+        self.spans.extend(spans)
+
+    def shutdown(self) -> None:
+        """Drop the kept spans."""
+        self.spans.clear()
+
+
+class FileSpanExporter:
+    """Appends spans to a file as OTLP JSON, one export request per line.
+
+    Spans are queued and written in batches by a background thread, so that
+    exporting does not block the event loop on the disk. Spans that are
+    exported while the queue is full are dropped.
+    """
+
+    def __init__(
+        self,
+        path: t.Union[str, pathlib.Path],
+        *,
+        max_queued_spans: int = DEFAULT_MAX_QUEUED_SPANS,
+        flush_interval: float = DEFAULT_FLUSH_INTERVAL,
+    ) -> None:
+        """Create a file span exporter.
+
+        Args:
+            path: The file to append spans to. It is opened on first export.
+            max_queued_spans: How many spans may wait to be written.
+            flush_interval: The longest time spans wait to be written, in
+                seconds. A quarter of the queue is written sooner.
+        """
+        self._path = path
+        self._max_queued_spans = max_queued_spans
+        self._batch_size = max(max_queued_spans // 4, 1)
+        self._flush_interval = flush_interval
+        self._queue: collections.deque[Span] = collections.deque()
+        self._dropped_spans = 0
+        self._condition = threading.Condition()
+        self._writer: t.Optional[threading.Thread] = None
+        self._stopping = False
+
+    def export(self, spans: col_abc.Sequence[Span]) -> None:
+        """Queue ended spans to be appended to the file.
+
+        Args:
+            spans: The spans.
+        """
+        with self._condition:
+            if self._stopping:
+                return
+            if self._writer is None:
+                self._writer = threading.Thread(
+                    target=self._write_batches, name="span-exporter", daemon=True
+                )
+                self._writer.start()
+
+            queued_spans = spans[: self._max_queued_spans - len(self._queue)]
+            self._queue.extend(queued_spans)
+            self._dropped_spans += len(spans) - len(queued_spans)
+            if len(self._queue) >= self._batch_size:
+                self._condition.notify()
+
+    def shutdown(self) -> None:
+        """Write the queued spans and close the file."""
+        with self._condition:
+            self._stopping = True
+            writer, self._writer = self._writer, None
+            self._condition.notify()
+        if writer is not None:
+            writer.join()
+
+    def _write_batches(self) -> None:
+        """Append queued spans to the file until the exporter shuts down."""
+        with open(self._path, "ab") as file:
+            while True:
+                with self._condition:
+                    if not self._stopping and len(self._queue) < self._batch_size:
+                        self._condition.wait(self._flush_interval)
+                    batch = [
+                        self._queue.popleft()
+                        for _ in range(min(len(self._queue), self._batch_size))
+                    ]
+                    dropped_spans, self._dropped_spans = self._dropped_spans, 0
+                    stopped = self._stopping and not self._queue
+
+                if dropped_spans:
+                    logger.warning(
+                        "Dropped %d spans, the export queue was full", dropped_spans
+                    )
+                if batch:
+                    file.write(orjson.dumps(to_otlp_request(batch)) + b"\n")
+                    file.flush()
+                if stopped:
+                    return
+
+
+class Tracer:
+    """Starts server spans of sampled requests and exports ended spans.
+
+    Sampling is parent-based: requests that carry a trace context follow the
+    sampling decision of their caller, others are sampled at the sample rate.
+    """
+
+    def __init__(
+        self,
+        *,
+        exporter: ISpanExporter,
+        sample_rate: float,
+        service_name: str,
+    ) -> None:
+        """Create a tracer.
+
+        Args:
+            exporter: Exports ended spans.
+            sample_rate: The share of requests without a trace context that
+                will be traced.
+            service_name: The name of the traced service.
+        """
+        self._exporter = exporter
+        self._sample_rate = sample_rate
+        self._resource: dict[str, AttributeValue] = {"service.name": service_name}
+
+    @property
+    def resource(self) -> col_abc.Mapping[str, AttributeValue]:
+        """Attributes of the service that produces the spans.
+
+        Returns:
+            The attributes.
+        """
+        return self._resource
+
+    def should_sample(self, parent: t.Optional[SpanContext]) -> bool:
+        """Decide whether a request will be traced.
+
+        Args:
+            parent: The context of the caller's span, if any.
+
+        Returns:
+            Whether the request will be traced.
+        """
+        if parent is not None:
+            return parent.sampled
+        # Sampling does not need to be cryptographically secure
+        return random.random() < self._sample_rate  # noqa: S311
+
+    def start_server_span(
+        self,
+        name: str,
+        *,
+        parent: t.Optional[SpanContext],
+        attributes: t.Optional[col_abc.Mapping[str, AttributeValue]] = None,
+    ) -> Span:
+        """Start the span of a request the service handles.
+
+        Args:
+            name: The name of the span.
+            parent: The context of the caller's span, `None` to start a trace.
+            attributes: Attributes that describe the request.
+
+        Returns:
+            The started span.
+        """
+        if parent is None:
+            trace_id, trace_state, parent_span_id = secrets.token_hex(16), "", None
+        else:
+            trace_id, trace_state = parent.trace_id, parent.trace_state
+            parent_span_id = parent.span_id
+        context = SpanContext(
+            trace_id=trace_id,
+            span_id=secrets.token_hex(8),
+            sampled=True,
+            trace_state=trace_state,
+        )
+        return Span(
+            name,
+            tracer=self,
+            context=context,
+            parent_span_id=parent_span_id,
+            kind=SpanKind.SERVER,
+            attributes=attributes,
+        )
+
+    def start_child_span(
+        self,
+        name: str,
+        *,
+        parent: Span,
+        kind: SpanKind = SpanKind.INTERNAL,
+        attributes: t.Optional[col_abc.Mapping[str, AttributeValue]] = None,
+    ) -> Span:
+        """Start a span of an operation within a traced request.
+
+        Args:
+            name: The name of the span.
+            parent: The parent span.
+            kind: The role of the span in the trace.
+            attributes: Attributes that describe the operation.
+
+        Returns:
+            The started span.
+        """
+        context = parent.context._replace(span_id=secrets.token_hex(8))
+        return Span(
+            name,
+            tracer=self,
+            context=context,
+            parent_span_id=parent.context.span_id,
+            kind=kind,
+            attributes=attributes,
+        )
+
+    def export(self, span: Span) -> None:
+        """Export an ended span.
+
+        Args:
+            span: The span.
+        """
+        self._exporter.export((span,))
+
+    def shutdown(self) -> None:
+        """Shut the exporter down."""
+        self._exporter.shutdown()
+
+
+class _SpanScope:
+    """Makes a span current while the code in the scope runs."""
+
+    def __init__(self, span: Span) -> None:
+        """Create a span scope.
+
+        Args:
+            span: The span.
+        """
+        self._span = span
+        self._token: contextvars.Token[t.Optional[Span]]
+
+    def __enter__(self) -> Span:
+        """Make the span current.
+
+        Returns:
+            The span.
+        """
+        self._token = _current_span.set(self._span)
+        return self._span
+
+    def __exit__(
+        self,
+        exc_type: t.Optional[type[BaseException]],
+        exc: t.Optional[BaseException],
+        traceback: t.Optional[types.TracebackType],
+    ) -> None:
+        """End the span, recording the exception that was raised, if any.
+
+        Args:
+            exc_type: The type of the raised exception.
+            exc: The raised exception.
+            traceback: The traceback of the raised exception.
+        """
+        if exc is not None:
+            self._span.record_exception(exc)
+        self._span.end()
+        _current_span.reset(self._token)
+
+
+class _NoopScope:
+    """Stands in for span scopes when nothing is traced."""
+
+    def __enter__(self) -> None:
+        """Do nothing."""
+
+    def __exit__(self, *exc_info: t.Any) -> None:
+        """Do nothing.
+
+        Args:
+            exc_info: The raised exception, if any.
+        """
+
+
+_NOOP_SCOPE: t.Final = _NoopScope()
+
+
+def span(
+    name: str,
+    *,
+    kind: SpanKind = SpanKind.INTERNAL,
+    attributes: t.Optional[col_abc.Mapping[str, AttributeValue]] = None,
+) -> t.ContextManager[t.Optional[Span]]:
+    """Trace the code in the context as a child of the current span.
+
+    Args:
+        name: The name of the span.
+        kind: The role of the span in the trace.
+        attributes: Attributes that describe the operation.
+
+    Returns:
+        A context manager that enters the started span, or `None` if the
+        current request is not traced.
+    """
+    parent = _current_span.get()
+    if parent is None:
+        return _NOOP_SCOPE
+    return _SpanScope(
+        parent.tracer.start_child_span(
+            name, parent=parent, kind=kind, attributes=attributes
+        )
+    )
+
+
+def current_span() -> t.Optional[Span]:
+    """Return the span of the code that runs.
+
+    Returns:
+        The current span, `None` if the current request is not traced.
+    """
+    return _current_span.get()
+
+
+def current_traceparent() -> t.Optional[str]:
+    """Return the `traceparent` header for requests to other services.
+
+    Returns:
+        The value of the header, `None` if the current request neither is
+        traced nor continues the trace of its caller.
+    """
+    current = _current_span.get()
+    if current is not None:
+        return format_traceparent(current.context)
+    unsampled_context = _unsampled_context.get()
+    if unsampled_context is not None:
+        return format_traceparent(unsampled_context)
+    return None
+
+
+class TracingMiddleware:
+    """An ASGI middleware that traces sampled requests."""
+
+    def __init__(self, app: st_types.ASGIApp, *, tracer: Tracer) -> None:
+        """Create a tracing middleware.
+
+        Args:
+            app: The wrapped ASGI application.
+            tracer: The tracer that starts server spans.
+        """
+        self._app = app
+        self._tracer = tracer
+
+    async def __call__(
+        self, scope: st_types.Scope, receive: st_types.Receive, send: st_types.Send
+    ) -> None:
+        """Handle an ASGI connection.
+
+        Args:
+            scope: The connection scope.
+            receive: A callable that receives ASGI events.
+            send: A callable that sends ASGI events.
+        """
+        if scope["type"] != "http":
+            await self._app(scope, receive, send)
+            return
+
+        headers = st_ds.Headers(scope=scope)
+        traceparent = headers.get("traceparent")
+        parent = (
+            None
+            if traceparent is None
+            else parse_traceparent(traceparent, headers.get("tracestate", ""))
+        )
+        if not self._tracer.should_sample(parent):
+            if parent is None:
+                await self._app(scope, receive, send)
+                return
+            # Callees take part in the trace too, but do not sample it either
+            token = _unsampled_context.set(parent._replace(sampled=False))
+            try:
+                await self._app(scope, receive, send)
+            finally:
+                _unsampled_context.reset(token)
+            return
+
+        route = routing.route_path(scope)
+        server_span = self._tracer.start_server_span(
+            f"{scope['method']} {route}",
+            parent=parent,
+            attributes={
+                "http.method": scope["method"],
+                "http.route": route,
+                "http.target": scope["path"],
+            },
+        )
+
+        async def send_with_status(message: st_types.Message) -> None:
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                server_span.set_attribute("http.status_code", status_code)
+                if status_code >= 500:
+                    server_span.set_status(StatusCode.ERROR)
+            await send(message)
+
+        with _SpanScope(server_span):
+            await self._app(scope, receive, send_with_status)
@@ -0,0 +1,168 @@
+"""Warming the application up before it accepts traffic.
+
+A new instance opens its database connections lazily and prepares each
+statement on each connection the first time it runs, so its first requests
+are much slower than the rest. Warm-up pays these costs at startup instead.
+
+Warm-up requests hold a connection of every database in a transaction that
+is rolled back, and the app runs their statements on the connections of the
+task that sends them, so requests that write leave nothing behind.
+
+Warm-up runs as the last startup handler. The server does not accept
+connections until startup handlers finish, so readiness probes only succeed
+once the instance is warm.
+"""
+import asyncio
+import collections.abc as col_abc
+import contextlib
+import logging
+
+import databases
+import starlette.types as st_types
+
+import {{cookiecutter.service_name}}._repositories as repos
+
+logger = logging.getLogger(__name__)
+
+
+class Warmup:
+    """Warms database connections and request handling up."""
+
+    def __init__(
+        self,
+        *,
+        dbs: col_abc.Sequence[databases.Database],
+        statements: col_abc.Sequence[repos.Statement],
+        connections: int,
+        requests: col_abc.Sequence[str],
+        timeout: float,
+        app: st_types.ASGIApp,
+    ) -> None:
+        """Create a warm-up.
+
+        Args:
+            dbs: Databases whose connections are warmed up, like shards.
+            statements: Statements to prepare on every warmed up connection.
+            connections: How many connections of each database to open and
+                warm up.
+            requests: Paths that are requested through the app.
+            timeout: The longest time the warm-up may take, in seconds.
+            app: The app that handles the warm-up requests.
+        """
+        self._dbs = dbs
+        self._statements = statements
+        self._connections = connections
+        self._requests = requests
+        self._timeout = timeout
+        self._app = app
+
+    async def run(self) -> None:
+        """Warm the application up.
+
+        Warm-up is best effort: if it fails or times out, the application
+        starts anyway and warms up with its first requests.
+        """
+        try:
+            await asyncio.wait_for(self._run(), self._timeout)
+        except asyncio.TimeoutError:
+            logger.warning("Warm-up did not finish in %s seconds", self._timeout)
+        except Exception:
+            logger.exception("Warm-up failed")
+
+    async def _run(self) -> None:
+        """Warm connections up, then requests."""
+        await asyncio.gather(*(self._warm_connections(db) for db in self._dbs))
+        if self._requests:
+            await self._warm_requests()
+        logger.info("Warm-up finished")
+
+    async def _warm_requests(self) -> None:
+        """Send the warm-up requests, rolling back what they write."""
+        async with contextlib.AsyncExitStack() as stack:
+            for db in self._dbs:
+                connection = await stack.enter_async_context(db.connection())
+                await stack.enter_async_context(
+                    connection.transaction(force_rollback=True)
+                )
+            for path in self._requests:
+                status = await self._request(path)
+                if status >= 400:
+                    logger.warning("Warm-up request to %r returned %s", path, status)
+
+    async def _warm_connections(self, db: databases.Database) -> None:
+        """Open connections and prepare the statements on each of them.
+
+        Args:
+            db: The database whose connections are warmed up.
+        """
+        # Every task gets its own connection from the pool. They are all held
+        # until all of them are acquired, so no connection is warmed twice
+        acquired = 0
+        all_acquired = asyncio.Event()
+        warmed_connections: set[int] = set()
+
+        async def warm_connection() -> None:
+            nonlocal acquired
+            async with db.connection() as connection:
+                acquired += 1
+                if acquired == self._connections:
+                    all_acquired.set()
+                await all_acquired.wait()
+
+                # Test databases share a single connection between tasks
+                raw_connection_id = id(connection.raw_connection)
+                if raw_connection_id in warmed_connections:
+                    return
+                warmed_connections.add(raw_connection_id)
+                await self._prepare_statements(connection)
+
+        await asyncio.gather(
+            *(asyncio.create_task(warm_connection()) for _ in range(self._connections))
+        )
+
+    async def _prepare_statements(self, connection: databases.core.Connection) -> None:
+        """Run the statements once, so the connection caches them as prepared.
+
+        Args:
+            connection: The connection.
+        """
+        # The driver caches statements it has run, and changes are rolled back
+        async with connection.transaction(force_rollback=True):
+            for statement, values in self._statements:
+                await connection.fetch_all(statement, values)
+
+    async def _request(self, path: str) -> int:
+        """Send a synthetic `GET` request through the app.
+
+        Args:
+            path: The requested path.
+
+        Returns:
+            The status code of the response.
+        """
+        scope: st_types.Scope = {
+            "type": "http",
+            "asgi": {"version": "3.0"},
+            "http_version": "1.1",
+            "method": "GET",
+            "scheme": "http",
+            "path": path,
+            "raw_path": path.encode(),
+            "root_path": "",
+            "query_string": b"",
+            "headers": [(b"host", b"warmup")],
+            "client": None,
+            "server": None,
+        }
+        status = 0
+
+        async def receive() -> st_types.Message:
+            return {"type": "http.request", "body": b"", "more_body": False}
+
+        async def send(message: st_types.Message) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+
+        await self._app(scope, receive, send)
+        return status
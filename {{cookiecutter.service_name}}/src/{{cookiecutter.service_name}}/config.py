@@ -46,41 +46,220 @@ def _render_app_config_filename(app_environment_name: str) -> str:
     return f"{app_environment_name}.yaml"
 
 
-def env_aware_yaml_configuration_settings_source(
-    settings: pyd.BaseSettings,
-) -> dict[str, t.Any]:
-    """A source for the environment-aware YAML config file.
+def get_app_config_path(config_file_dir: pathlib.Path) -> t.Optional[pathlib.Path]:
+    """Return a path to the config file of the current application environment.
 
     Args:
-        settings: The settings for which the config file will be read.
+        config_file_dir: The directory that stores config files.
 
     Returns:
-        The contents of the matching configuration file.
+        The path to the config file, or `None` if the name of the application
+        environment is not set.
     """
     try:
         application_environment_name = _get_app_environment()
     except AppEnvironmentNotSetError:
         # When the name of an application's environment is not set, configs
         # cannot be loaded from appropriate YAML files
-        return {}
+        return None
+
+    config_file_name = _render_app_config_filename(application_environment_name)
+    return config_file_dir / config_file_name
+
+
+def env_aware_yaml_configuration_settings_source(
+    settings: pyd.BaseSettings,
+) -> dict[str, t.Any]:
+    """A source for the environment-aware YAML config file.
 
+    Args:
+        settings: The settings for which the config file will be read.
+
+    Returns:
+        The contents of the matching configuration file.
+    """
     # The __config__ attribute is dynamically set on the model config class, so
     # the type annotations should be ignored
     config_file_dir: pathlib.Path = settings.__config__.configs_dir  # type: ignore
 
-    config_file_name = _render_app_config_filename(application_environment_name)
-    config_path = config_file_dir / config_file_name
+    config_path = get_app_config_path(config_file_dir)
+    if config_path is None:
+        return {}
 
     with open(config_path) as config_fp:
         config_contents = yaml.safe_load(config_fp)
     return config_contents
 
 
+class CompressionConfig(pyd.BaseModel):
+    """Response compression configuration."""
+
+    # Bodies smaller than this are sent as is: compressing them costs more CPU
+    # than it saves on the wire
+    minimum_size: pyd.NonNegativeInt = 500
+    gzip_level: int = pyd.Field(6, ge=1, le=9)
+    brotli_quality: int = pyd.Field(4, ge=0, le=11)
+    zstd_level: int = pyd.Field(3, ge=1, le=22)
+
+
+class DatabasePoolConfig(pyd.BaseModel):
+    """Database connection pool configuration.
+
+    Passed as is to the database driver. Can be changed while the application
+    is running if config reloading is enabled.
+    """
+
+    min_size: pyd.PositiveInt = 10
+    max_size: pyd.PositiveInt = 10
+    # Default timeout of a single query, in seconds
+    command_timeout: t.Optional[pyd.PositiveFloat] = None
+
+    @pyd.root_validator(skip_on_failure=True)
+    @classmethod
+    def check_min_size_fits_max_size(cls, values: dict[str, t.Any]) -> dict[str, t.Any]:
+        """Check that the pool can hold its minimum size.
+
+        Args:
+            values: Values of the fields.
+
+        Returns:
+            The checked values.
+
+        Raises:
+            ValueError: if the minimum size exceeds the maximum size.
+        """
+        if values["min_size"] > values["max_size"]:
+            raise ValueError("min_size must not exceed max_size")
+        return values
+
+
+class ConfigReloadConfig(pyd.BaseModel):
+    """Configuration of reloading the config while the application runs."""
+
+    enabled: bool = False
+    # How often the config file is checked for changes, in seconds
+    poll_interval: pyd.PositiveFloat = 5.0
+    # How long replaced database pools keep serving requests that already use
+    # them before they are closed, in seconds. Has to cover the longest request
+    # deadline, see `deadlines.max_timeout`
+    drain_timeout: pyd.NonNegativeFloat = 60.0
+
+
+class DeadlinesConfig(pyd.BaseModel):
+    """Request deadlines configuration.
+
+    Timeouts are in seconds.
+    """
+
+    default_timeout: pyd.PositiveFloat = 10.0
+    max_timeout: pyd.PositiveFloat = 60.0
+    # Timeouts of routes by their path templates, like `/health/`
+    route_timeouts: dict[str, pyd.PositiveFloat] = {}
+    header_name: str = "X-Request-Timeout"
+    # Cancels requests whose clients disconnected, at the cost of two more
+    # tasks per request
+    cancel_on_disconnect: bool = False
+
+
+class AllocationTrackingConfig(pyd.BaseModel):
+    """Per-route memory allocation tracking configuration."""
+
+    enabled: bool = False
+    # Taking allocation snapshots is expensive, so only a share of requests is
+    # measured
+    sample_rate: float = pyd.Field(0.01, ge=0.0, le=1.0)
+    top_sites: pyd.PositiveInt = 10
+
+
+class ProfilingConfig(pyd.BaseModel):
+    """On-demand sampling profiler configuration.
+
+    Requests are profiled only on demand of an admin, so the admin token has
+    to be set as well.
+    """
+
+    enabled: bool = False
+    # CPU time between samples, in seconds
+    sample_interval: pyd.PositiveFloat = 0.005
+    # Requests that carry this header and the admin token are profiled
+    header_name: str = "X-Profile"
+
+
+class TracingConfig(pyd.BaseModel):
+    """Distributed tracing configuration."""
+
+    enabled: bool = False
+    # The share of requests that start traces. Requests from callers that pass
+    # a trace context follow the caller's sampling decision instead
+    sample_rate: float = pyd.Field(0.01, ge=0.0, le=1.0)
+    exporter: t.Literal["file", "in_memory"] = "file"
+    # Where the file exporter appends spans, as OTLP JSON export requests
+    file_path: str = "spans.jsonl"
+    # The longest time spans wait to be written to the file, in seconds
+    flush_interval: pyd.PositiveFloat = 1.0
+    # Spans that wait to be written, or that the in-memory exporter keeps.
+    # The file exporter drops new spans past the limit, the in-memory exporter
+    # drops the oldest ones
+    max_queued_spans: pyd.PositiveInt = 2048
+
+
+class WarmupConfig(pyd.BaseModel):
+    """Configuration of warming the application up before it accepts traffic."""
+
+    enabled: bool = True
+    # Paths that are requested once through the app, to warm the code up
+    requests: list[str] = ["/health/"]
+    # The longest time warm-up may delay the startup, in seconds
+    timeout: pyd.PositiveFloat = 30.0
+
+
 class Config(pyd.BaseSettings):
     """Application configuration."""
 
     name: str
+    # The first database shard, which also stores tables that are not sharded
     database_dsn: pyd.PostgresDsn
+    # Shards in addition to `database_dsn`. Rows are assigned to shards by
+    # consistent hashing, so adding a shard reassigns only a part of the keys.
+    # Existing rows are not moved: rows whose keys the new shard takes over
+    # have to be copied to it by hand before it is added
+    database_shard_dsns: list[pyd.PostgresDsn] = []
+    # Applies to the pool of every shard
+    database_pool: DatabasePoolConfig = DatabasePoolConfig()
+    # Admin endpoints are disabled unless the token is set
+    admin_token: t.Optional[pyd.SecretStr] = None
+    compression: CompressionConfig = CompressionConfig()
+    deadlines: DeadlinesConfig = DeadlinesConfig()
+    allocation_tracking: AllocationTrackingConfig = AllocationTrackingConfig()
+    profiling: ProfilingConfig = ProfilingConfig()
+    tracing: TracingConfig = TracingConfig()
+    warmup: WarmupConfig = WarmupConfig()
+    config_reload: ConfigReloadConfig = ConfigReloadConfig()
+
+    @pyd.root_validator(skip_on_failure=True)
+    @classmethod
+    def check_drain_covers_deadlines(cls, values: dict[str, t.Any]) -> dict[str, t.Any]:
+        """Check that replaced pools outlive the requests that use them.
+
+        Args:
+            values: Values of the fields.
+
+        Returns:
+            The checked values.
+
+        Raises:
+            ValueError: if reloading is enabled and the drain timeout is
+                shorter than the maximum request deadline.
+        """
+        config_reload: ConfigReloadConfig = values["config_reload"]
+        deadlines: DeadlinesConfig = values["deadlines"]
+        drain_too_short = config_reload.drain_timeout < deadlines.max_timeout
+        if config_reload.enabled and drain_too_short:
+            raise ValueError(
+                "config_reload.drain_timeout must not be shorter than "
+                "deadlines.max_timeout"
+            )
+        return values
 
     class Config:
         """Configuration for the config Pydantic model."""
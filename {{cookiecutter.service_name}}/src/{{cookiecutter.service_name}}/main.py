@@ -1,9 +1,15 @@
 """An entry point to the application."""
 import fastapi as fa
 
+import {{cookiecutter.service_name}}._allocations as svc_allocations
+import {{cookiecutter.service_name}}._compression as svc_compression
 import {{cookiecutter.service_name}}._containers as svc_containers
+import {{cookiecutter.service_name}}._deadlines as svc_deadlines
 import {{cookiecutter.service_name}}._endpoints as svc_endpoints
 import {{cookiecutter.service_name}}._events as svc_events
+import {{cookiecutter.service_name}}._profiling as svc_profiling
+import {{cookiecutter.service_name}}._reload as svc_reload
+import {{cookiecutter.service_name}}._tracing as svc_tracing
 import {{cookiecutter.service_name}}.config as svc_cfg
 
 
@@ -33,6 +39,87 @@ def _setup_container() -> svc_containers.Container:
     return container
 
 
+def _setup_middleware(app: Application, container: svc_containers.Container) -> None:
+    """Add middleware to the application.
+
+    The middleware that is added last wraps all the others.
+
+    Args:
+        app: The application.
+        container: The dependency injection container of the application.
+    """
+    if container.config.profiling.enabled():
+        profiler = container.profiler()
+        app.add_middleware(
+            svc_profiling.ProfilingMiddleware,
+            profiler=profiler,
+            header_name=container.config.profiling.header_name(),
+            admin_token=container.config.admin_token,
+        )
+        app.add_event_handler("startup", profiler.start)
+        app.add_event_handler("shutdown", profiler.stop)
+
+    if container.config.allocation_tracking.enabled():
+        app.add_middleware(
+            svc_allocations.AllocationTrackingMiddleware,
+            tracker=container.allocation_tracker(),
+        )
+
+    if container.config.deadlines.cancel_on_disconnect():
+        app.add_middleware(svc_deadlines.CancelOnDisconnectMiddleware)
+
+    app.add_middleware(
+        svc_compression.CompressionMiddleware, **container.config.compression()
+    )
+
+    if container.config.tracing.enabled():
+        tracer = container.tracer()
+        app.add_middleware(svc_tracing.TracingMiddleware, tracer=tracer)
+        app.add_event_handler("shutdown", tracer.shutdown)
+
+
+def _setup_config_reload(app: Application, container: svc_containers.Container) -> None:
+    """Reload the config while the application runs, if enabled.
+
+    Args:
+        app: The application.
+        container: The dependency injection container of the application.
+    """
+    if not container.config.config_reload.enabled():
+        return
+
+    # The __config__ attribute is dynamically set on the model config class, so
+    # the type annotations should be ignored
+    configs_dir = svc_cfg.Config.__config__.configs_dir  # type: ignore
+    reloader = svc_reload.ConfigReloader(
+        container, config_path=svc_cfg.get_app_config_path(configs_dir)
+    )
+    app.add_event_handler("startup", reloader.start)
+    app.add_event_handler("shutdown", reloader.stop)
+
+
+def _setup_warmup(app: Application, container: svc_containers.Container) -> None:
+    """Warm the application up before it accepts traffic, if enabled.
+
+    Args:
+        app: The application.
+        container: The dependency injection container of the application.
+    """
+    if not container.config.warmup.enabled():
+        return
+
+    async def warm_up() -> None:
+        # The warm-up is created at startup, so that it warms the databases
+        # the application connected to, including overridden ones. Warm-up
+        # requests skip the middleware, so that instrumentation does not
+        # report them
+        await container.warmup(app=app.router).run()
+
+    # Startup handlers run in the order they are added, so warm-up runs once
+    # everything else has started
+    app.add_event_handler("startup", warm_up)
+
+
 def _create_app() -> Application:
     """Create the application.
 
@@ -46,7 +133,14 @@ def _create_app() -> Application:
         on_shutdown=[svc_events.disconnect_database],
     )
     app.container = container
+    app.add_exception_handler(
+        svc_deadlines.DeadlineExceededError, svc_endpoints.handle_deadline_exceeded
+    )
     app.include_router(svc_endpoints.api_router)
+    app.include_router(svc_endpoints.admin_router)
+    _setup_middleware(app, container)
+    _setup_config_reload(app, container)
+    _setup_warmup(app, container)
 
     return app
 
@@ -1,5 +1,6 @@
 """Global fixtures available for all tests in the project."""
 
+import asyncio
 import collections.abc as col_abc
 import pathlib
 import typing as t
@@ -8,6 +9,7 @@ import databases
 import fastapi.testclient as fa_tc
 import pytest
 
+import {{cookiecutter.service_name}}._sharding as svc_sharding
 import {{cookiecutter.service_name}}.config as svc_cfg
 import {{cookiecutter.service_name}}.main as svc_main
 
@@ -16,6 +18,176 @@ APP_CONFIGS_DIRECTORY_NAME: t.Final[str] = "configs"
 APP_CONFIG_NAMES: t.Final[list[str]] = ["dev.yaml"]
 
 
+class ConnectionStub:
+    """Records statements in place of a database connection."""
+
+    def __init__(self, raw_connection: object) -> None:
+        """Create a connection stub.
+
+        Args:
+            raw_connection: The connection of the driver.
+        """
+        self.raw_connection = raw_connection
+        self.statements: list[tuple[t.Any, t.Optional[dict[str, t.Any]]]] = []
+        self.rolled_back_transactions = 0
+
+    async def __aenter__(self) -> "ConnectionStub":
+        """Acquire the connection.
+
+        Returns:
+            The connection.
+        """
+        return self
+
+    async def __aexit__(self, *exc_info: t.Any) -> None:
+        """Release the connection.
+
+        Args:
+            exc_info: The exception raised while the connection was held.
+        """
+
+    def transaction(self, *, force_rollback: bool) -> "TransactionStub":
+        """Start a transaction.
+
+        Args:
+            force_rollback: Whether the transaction is rolled back at the end.
+
+        Returns:
+            The transaction.
+        """
+        assert force_rollback
+        return TransactionStub(self)
+
+    async def fetch_all(self, statement: t.Any, values: t.Any) -> list[t.Any]:
+        """Record a statement.
+
+        Args:
+            statement: The statement.
+            values: Values of the statement's bind parameters.
+
+        Returns:
+            No rows.
+        """
+        self.statements.append((statement, values))
+        return []
+
+
+class TransactionStub:
+    """Counts rolled back transactions of a connection stub."""
+
+    def __init__(self, connection: ConnectionStub) -> None:
+        """Create a transaction stub.
+
+        Args:
+            connection: The connection of the transaction.
+        """
+        self._connection = connection
+
+    async def __aenter__(self) -> None:
+        """Start the transaction."""
+
+    async def __aexit__(self, *exc_info: t.Any) -> None:
+        """Roll the transaction back.
+
+        Args:
+            exc_info: The exception raised inside the transaction.
+        """
+        self._connection.rolled_back_transactions += 1
+
+
+class DatabaseStub:
+    """Records the use of a database in place of it."""
+
+    def __init__(
+        self,
+        *,
+        rows: t.Optional[list[t.Any]] = None,
+        delay: float = 0,
+        shared_connection: bool = False,
+    ) -> None:
+        """Create a database stub.
+
+        Args:
+            rows: Rows that fetching all rows returns.
+            delay: Seconds that fetching a row takes.
+            shared_connection: Whether all connections share a driver
+                connection, like test databases do.
+        """
+        self.rows = rows or []
+        self.delay = delay
+        self._shared_raw_connection = object() if shared_connection else None
+        self.refuses_connections = False
+        self.connected = False
+        self.connects = 0
+        self.disconnects = 0
+        self.fetched: list[dict[str, t.Any]] = []
+        self.cancelled = False
+        self.connections: list[ConnectionStub] = []
+
+    async def connect(self) -> None:
+        """Connect to the database.
+
+        Raises:
+            ConnectionRefusedError: if the database refuses connections.
+        """
+        self.connects += 1
+        if self.refuses_connections:
+            raise ConnectionRefusedError
+        self.connected = True
+
+    async def disconnect(self) -> None:
+        """Disconnect from the database."""
+        self.disconnects += 1
+        self.connected = False
+
+    async def fetch_all(self, query: t.Any, values: t.Any = None) -> list[t.Any]:
+        """Return the rows of the database.
+
+        Args:
+            query: The query.
+            values: Values of the query's bind parameters.
+
+        Returns:
+            The rows.
+        """
+        # Yields to the loop, so that databases are queried concurrently
+        await asyncio.sleep(0)
+        return self.rows
+
+    async def fetch_one(
+        self, query: t.Any, values: dict[str, t.Any]
+    ) -> dict[str, t.Any]:
+        """Return an inserted healthcheck row.
+
+        Args:
+            query: The statement.
+            values: Values of the statement's bind parameters.
+
+        Raises:
+            asyncio.CancelledError: if fetching the row is cancelled.
+
+        Returns:
+            The row.
+        """
+        self.fetched.append(values)
+        try:
+            await asyncio.sleep(self.delay)
+        except asyncio.CancelledError:
+            self.cancelled = True
+            raise
+        return values | {"status": "ok"}
+
+    def connection(self) -> ConnectionStub:
+        """Return a connection, like a connection pool.
+
+        Returns:
+            The connection.
+        """
+        connection = ConnectionStub(self._shared_raw_connection or object())
+        self.connections.append(connection)
+        return connection
+
+
 def _get_test_database(config: svc_cfg.Config) -> databases.Database:
     """Return a specially configured test database instance.
 
@@ -32,6 +204,68 @@ def _get_test_database(config: svc_cfg.Config) -> databases.Database:
     return databases.Database(database_uri, force_rollback=True)
 
 
+def _get_test_shard_router(
+    config: svc_cfg.Config, test_database: databases.Database
+) -> svc_sharding.ShardRouter:
+    """Return a router of test databases for all shards.
+
+    Args:
+        config: The application configuration object.
+        test_database: The test database of the first shard.
+
+    Returns:
+        A shard router whose shards roll back all applied operations on
+        disconnect.
+    """
+    return svc_sharding.ShardRouter.from_dsns(
+        primary=test_database,
+        primary_dsn=config.database_dsn,
+        dsns=config.database_shard_dsns,
+        pool_options={"force_rollback": True},
+    )
+
+
+@pytest.fixture(autouse=True)
+def current_event_loop() -> col_abc.Generator[asyncio.AbstractEventLoop, None, None]:
+    """Give every test a fresh current event loop.
+
+    Test clients run apps in the current event loop, while `asyncio.run()`
+    leaves none once it finishes.
+
+    Yields:
+        The current event loop.
+    """
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+    yield loop
+    asyncio.set_event_loop(None)
+    loop.close()
+
+
+@pytest.fixture
+def database_stub(monkeypatch: pytest.MonkeyPatch) -> DatabaseStub:
+    """Make all databases connect and disconnect through a single stub.
+
+    Args:
+        monkeypatch: The monkeypatcher.
+
+    Returns:
+        The stub that records connecting to and disconnecting from any
+        database.
+    """
+    stub = DatabaseStub()
+
+    async def connect(db: databases.Database) -> None:
+        await stub.connect()
+
+    async def disconnect(db: databases.Database) -> None:
+        await stub.disconnect()
+
+    monkeypatch.setattr(databases.Database, "connect", connect)
+    monkeypatch.setattr(databases.Database, "disconnect", disconnect)
+    return stub
+
+
 @pytest.fixture
 def test_client() -> col_abc.Generator[fa_tc.TestClient, None, None]:
     """Return a test client.
@@ -42,11 +276,13 @@ def test_client() -> col_abc.Generator[fa_tc.TestClient, None, None]:
     app = svc_main._create_app()
     app_config = svc_cfg.Config()
 
-    # Tests should use a specially configured database instance
+    # Tests should use specially configured database instances
     test_database = _get_test_database(app_config)
+    test_shard_router = _get_test_shard_router(app_config, test_database)
     with app.container.db.override(test_database):
-        with fa_tc.TestClient(app) as test_client:
-            yield test_client
+        with app.container.shard_router.override(test_shard_router):
+            with fa_tc.TestClient(app) as test_client:
+                yield test_client
 
 
 @pytest.fixture
@@ -0,0 +1,176 @@
+"""Tests for per-route memory allocation tracking."""
+import collections.abc as col_abc
+import tracemalloc
+
+import fastapi as fa
+import fastapi.testclient as fa_tc
+import pytest
+
+import {{cookiecutter.service_name}}._allocations as svc_allocations
+import {{cookiecutter.service_name}}._routing as svc_routing
+
+# Objects allocated by requests that should show up as retained memory
+_RETAINED: list[bytes] = []
+
+
+@pytest.fixture
+def tracker() -> col_abc.Generator[svc_allocations.AllocationTracker, None, None]:
+    """Return a tracker that measures every request.
+
+    Yields:
+        An allocation tracker.
+    """
+    yield svc_allocations.AllocationTracker(sample_rate=1.0, top_sites=2)
+    _RETAINED.clear()
+
+
+@pytest.fixture
+def tracked_client(
+    tracker: svc_allocations.AllocationTracker,
+) -> col_abc.Generator[fa_tc.TestClient, None, None]:
+    """Return a test client for an app that tracks allocations.
+
+    Args:
+        tracker: The tracker used by the app.
+
+    Yields:
+        A test client.
+    """
+    app = fa.FastAPI()
+
+    @app.get("/leaky/{item_id}")
+    async def leaky(item_id: int) -> dict[str, int]:
+        _RETAINED.append(bytes(100_000))
+        return {"item_id": item_id}
+
+    app.add_middleware(svc_allocations.AllocationTrackingMiddleware, tracker=tracker)
+    with fa_tc.TestClient(app) as test_client:
+        yield test_client
+
+
+class TestAllocationTracker:
+    """Tests for the allocation tracker."""
+
+    def test_does_not_sample_during_foreign_tracing(
+        self, tracker: svc_allocations.AllocationTracker
+    ) -> None:
+        """A tracker should not sample requests while others trace allocations.
+
+        Given:
+            - A tracker with the sample rate of 1.
+            - And allocations are already traced.
+        When:
+            - Deciding whether to sample a request.
+        Then:
+            - The request is not sampled.
+            - And tracing is left running.
+
+        Args:
+            tracker: A tracker.
+        """
+        tracemalloc.start()
+        try:
+            assert not tracker.should_sample()
+            assert tracemalloc.is_tracing()
+        finally:
+            tracemalloc.stop()
+
+    def test_does_not_sample_with_zero_rate(
+        self, tracker: svc_allocations.AllocationTracker
+    ) -> None:
+        """A tracker with the sample rate of 0 should not sample requests.
+
+        Args:
+            tracker: A tracker.
+        """
+        tracker._sample_rate = 0.0
+        assert not tracker.should_sample()
+
+    def test_does_not_sample_concurrently(
+        self, tracker: svc_allocations.AllocationTracker
+    ) -> None:
+        """A tracker should measure a single request at a time.
+
+        Args:
+            tracker: A tracker.
+        """
+        with tracker.measure("/route"):
+            assert not tracker.should_sample()
+        assert tracker.should_sample()
+
+    def test_traces_only_during_measurement(
+        self, tracker: svc_allocations.AllocationTracker
+    ) -> None:
+        """Allocations should be traced only while a request is measured.
+
+        Args:
+            tracker: A tracker.
+        """
+        assert not tracemalloc.is_tracing()
+        with tracker.measure("/route"):
+            assert tracemalloc.is_tracing()
+        assert not tracemalloc.is_tracing()
+
+    def test_measure_reports_retained_allocations(
+        self, tracker: svc_allocations.AllocationTracker
+    ) -> None:
+        """Allocations that outlive a measurement should be reported.
+
+        Given:
+            - A tracker.
+        When:
+            - Retaining memory inside measurements for different routes.
+        Then:
+            - The route that retained the most memory is reported first.
+            - And the allocation site is reported.
+
+        Args:
+            tracker: A tracker.
+        """
+        with tracker.measure("/small"):
+            _RETAINED.append(bytes(10_000))
+        with tracker.measure("/large"):
+            _RETAINED.append(bytes(1_000_000))
+
+        large, small = tracker.report()
+
+        assert large.route == "/large"
+        assert large.sampled_requests == 1
+        assert large.retained_bytes >= 1_000_000
+        assert large.peak_bytes >= 1_000_000
+        assert large.top_sites[0].filename == __file__
+        assert small.route == "/small"
+        assert small.retained_bytes < large.retained_bytes
+
+
+class TestAllocationTrackingMiddleware:
+    """Tests for the allocation tracking middleware."""
+
+    def test_allocations_are_attributed_to_route_templates(
+        self,
+        tracked_client: fa_tc.TestClient,
+        tracker: svc_allocations.AllocationTracker,
+    ) -> None:
+        """Requests to the same route should be aggregated under its template.
+
+        Given:
+            - An app that tracks allocations of every request.
+        When:
+            - Requesting a route with different path parameters.
+            - And requesting an unknown path.
+        Then:
+            - Allocations are aggregated per route template.
+
+        Args:
+            tracked_client: A client for the tracked app.
+            tracker: The tracker used by the app.
+        """
+        tracked_client.get("/leaky/1")
+        tracked_client.get("/leaky/2")
+        tracked_client.get("/unknown")
+
+        reports = {report.route: report for report in tracker.report()}
+
+        assert reports["/leaky/{item_id}"].sampled_requests == 2
+        assert reports["/leaky/{item_id}"].retained_bytes >= 200_000
+        assert reports[svc_routing.UNMATCHED_ROUTE].sampled_requests == 1
@@ -0,0 +1,334 @@
+"""Tests for response compression."""
+import collections.abc as col_abc
+import typing as t
+import zlib
+
+import brotli
+import fastapi as fa
+import fastapi.responses as fa_resp
+import fastapi.testclient as fa_tc
+import pytest
+import starlette.types as st_types
+import zstandard
+
+import {{cookiecutter.service_name}}._compression as svc_compression
+
+MINIMUM_SIZE: t.Final[int] = 100
+LARGE_BODY: t.Final[bytes] = b"a healthy payload " * 100
+STREAM_CHUNKS: t.Final[list[bytes]] = [b"first chunk " * 20, b"second chunk " * 20]
+# Streaming decoders of every supported content coding, the way clients decode
+# bodies as they arrive
+DECOMPRESSORS: t.Final[dict[str, t.Callable[[], t.Callable[[bytes], bytes]]]] = {
+    "zstd": lambda: zstandard.ZstdDecompressor().decompressobj().decompress,
+    "br": lambda: brotli.Decompressor().process,
+    "gzip": lambda: zlib.decompressobj(zlib.MAX_WBITS | 16).decompress,
+}
+ENCODINGS: t.Final[list[str]] = list(DECOMPRESSORS)
+
+
+def _decompress(encoding: str, data: bytes) -> bytes:
+    """Decompress a body.
+
+    Args:
+        encoding: The content coding of the body.
+        data: The compressed body.
+
+    Returns:
+        The decompressed body.
+    """
+    return DECOMPRESSORS[encoding]()(data)
+
+
+async def _send_body_without_length(
+    scope: st_types.Scope, receive: st_types.Receive, send: st_types.Send
+) -> None:
+    """Send a single-message body without announcing its length.
+
+    Args:
+        scope: The connection scope.
+        receive: A callable that receives ASGI events.
+        send: A callable that sends ASGI events.
+    """
+    await send({"type": "http.response.start", "status": 200, "headers": []})
+    await send({"type": "http.response.body", "body": LARGE_BODY})
+
+
+@pytest.fixture
+def compressed_client() -> col_abc.Generator[fa_tc.TestClient, None, None]:
+    """Return a test client for an app wrapped in the compression middleware.
+
+    Yields:
+        A test client.
+    """
+    app = fa.FastAPI()
+
+    @app.get("/small")
+    async def small() -> fa_resp.Response:
+        return fa_resp.Response(b"tiny")
+
+    @app.get("/large")
+    async def large() -> fa_resp.Response:
+        return fa_resp.Response(LARGE_BODY)
+
+    @app.get("/stream")
+    async def stream() -> fa_resp.StreamingResponse:
+        async def generate_chunks() -> col_abc.AsyncGenerator[bytes, None]:
+            for chunk in STREAM_CHUNKS:
+                yield chunk
+
+        return fa_resp.StreamingResponse(generate_chunks())
+
+    @app.get("/short-stream")
+    async def short_stream() -> fa_resp.StreamingResponse:
+        async def generate_chunks() -> col_abc.AsyncGenerator[bytes, None]:
+            yield b"short"
+            yield b"stream"
+
+        return fa_resp.StreamingResponse(
+            generate_chunks(), headers={"Content-Length": "11"}
+        )
+
+    @app.get("/encoded")
+    async def encoded() -> fa_resp.Response:
+        return fa_resp.Response(LARGE_BODY, headers={"Content-Encoding": "custom"})
+
+    app.mount("/unsized", _send_body_without_length)
+    app.add_middleware(svc_compression.CompressionMiddleware, minimum_size=MINIMUM_SIZE)
+    with fa_tc.TestClient(app) as test_client:
+        yield test_client
+
+
+class TestNegotiateEncoding:
+    """Tests for the content coding negotiation."""
+
+    @pytest.mark.parametrize(
+        "accept_encoding, expected_encoding",
+        [
+            ("gzip, br", "br"),
+            ("gzip, br;q=0.5", "gzip"),
+            ("GZIP;Q=0.8", "gzip"),
+            ("br;level=1;q=0.4, gzip;q=0.5", "gzip"),
+            ("*", "br"),
+            ("*, br;q=0", "gzip"),
+            ("br;q=0, gzip;q=0", None),
+            ("gzip;q=invalid", None),
+            ("identity", None),
+            ("", None),
+        ],
+    )
+    def test_picks_the_best_acceptable_coding(
+        self, accept_encoding: str, expected_encoding: t.Optional[str]
+    ) -> None:
+        """Should pick the coding the client prefers, falling back to the one
+        the server prefers.
+
+        Given:
+            - An `Accept-Encoding` header.
+            - And the server supports Brotli and gzip, preferring Brotli.
+        When:
+            - Negotiating the content coding.
+        Then:
+            - The acceptable coding with the highest quality is picked.
+
+        Args:
+            accept_encoding: The value of the `Accept-Encoding` header.
+            expected_encoding: The coding that should be picked.
+        """
+        encoding = svc_compression.negotiate_encoding(accept_encoding, ["br", "gzip"])
+        assert encoding == expected_encoding
+
+
+class TestCompressionMiddleware:
+    """Tests for the compression middleware."""
+
+    @pytest.mark.parametrize("encoding", ENCODINGS)
+    def test_large_body_is_compressed(
+        self, compressed_client: fa_tc.TestClient, encoding: str
+    ) -> None:
+        """Should compress a body that is larger than the threshold.
+
+        Given:
+            - A client that accepts a content coding.
+        When:
+            - Requesting a body larger than the threshold.
+        Then:
+            - The body is compressed with the coding.
+            - And its length matches the compressed body.
+
+        Args:
+            compressed_client: A client for the compressed app.
+            encoding: The accepted content coding.
+        """
+        resp = compressed_client.get(
+            "/large", headers={"Accept-Encoding": encoding}, stream=True
+        )
+        raw_body = resp.raw.read(decode_content=False)
+
+        assert resp.headers["content-encoding"] == encoding
+        assert resp.headers["vary"] == "Accept-Encoding"
+        assert int(resp.headers["content-length"]) == len(raw_body)
+        assert len(raw_body) < len(LARGE_BODY)
+        assert _decompress(encoding, raw_body) == LARGE_BODY
+
+    def test_preferred_coding_is_used(
+        self, compressed_client: fa_tc.TestClient
+    ) -> None:
+        """Should use the coding the server prefers among equally acceptable ones.
+
+        Args:
+            compressed_client: A client for the compressed app.
+        """
+        resp = compressed_client.get(
+            "/large", headers={"Accept-Encoding": "gzip, br, zstd"}, stream=True
+        )
+
+        assert resp.headers["content-encoding"] == "zstd"
+
+    @pytest.mark.parametrize("encoding", ENCODINGS)
+    def test_small_body_is_sent_as_is(
+        self, compressed_client: fa_tc.TestClient, encoding: str
+    ) -> None:
+        """Should not compress a body that is smaller than the threshold.
+
+        Args:
+            compressed_client: A client for the compressed app.
+            encoding: The accepted content coding.
+        """
+        resp = compressed_client.get("/small", headers={"Accept-Encoding": encoding})
+
+        assert "content-encoding" not in resp.headers
+        assert resp.content == b"tiny"
+
+    @pytest.mark.parametrize("encoding", ENCODINGS)
+    def test_unsized_large_body_is_compressed(
+        self, compressed_client: fa_tc.TestClient, encoding: str
+    ) -> None:
+        """Should measure a body without a content length by its size.
+
+        Args:
+            compressed_client: A client for the compressed app.
+            encoding: The accepted content coding.
+        """
+        resp = compressed_client.get(
+            "/unsized", headers={"Accept-Encoding": encoding}, stream=True
+        )
+        raw_body = resp.raw.read(decode_content=False)
+
+        assert resp.headers["content-encoding"] == encoding
+        assert _decompress(encoding, raw_body) == LARGE_BODY
+
+    @pytest.mark.parametrize("encoding", ENCODINGS)
+    def test_short_stream_is_sent_as_is(
+        self, compressed_client: fa_tc.TestClient, encoding: str
+    ) -> None:
+        """Should not compress a streamed body whose announced length is small.
+
+        Args:
+            compressed_client: A client for the compressed app.
+            encoding: The accepted content coding.
+        """
+        resp = compressed_client.get(
+            "/short-stream", headers={"Accept-Encoding": encoding}
+        )
+
+        assert "content-encoding" not in resp.headers
+        assert resp.content == b"shortstream"
+
+    @pytest.mark.parametrize(
+        "accept_encoding", ["identity", "gzip;q=0", "br;q=0, zstd;q=0"]
+    )
+    def test_unacceptable_coding_is_not_used(
+        self, compressed_client: fa_tc.TestClient, accept_encoding: str
+    ) -> None:
+        """Should not compress a body if the client does not accept it.
+
+        Args:
+            compressed_client: A client for the compressed app.
+            accept_encoding: The value of the `Accept-Encoding` header.
+        """
+        resp = compressed_client.get(
+            "/large", headers={"Accept-Encoding": accept_encoding}
+        )
+
+        assert "content-encoding" not in resp.headers
+        assert resp.content == LARGE_BODY
+
+    def test_encoded_body_is_not_compressed_again(
+        self, compressed_client: fa_tc.TestClient
+    ) -> None:
+        """Should leave a body that already has a content coding intact.
+
+        Args:
+            compressed_client: A client for the compressed app.
+        """
+        resp = compressed_client.get(
+            "/encoded", headers={"Accept-Encoding": "gzip"}, stream=True
+        )
+
+        assert resp.headers["content-encoding"] == "custom"
+        assert resp.raw.read(decode_content=False) == LARGE_BODY
+
+    @pytest.mark.parametrize("encoding", ENCODINGS)
+    def test_streamed_body_is_compressed_chunk_by_chunk(
+        self, compressed_client: fa_tc.TestClient, encoding: str
+    ) -> None:
+        """Should compress every chunk of a streamed body as it is sent.
+
+        Given:
+            - A client that accepts a content coding.
+        When:
+            - Requesting a streamed body.
+        Then:
+            - The response has no content length.
+            - And the body decompresses to the concatenated chunks.
+
+        Args:
+            compressed_client: A client for the compressed app.
+            encoding: The accepted content coding.
+        """
+        resp = compressed_client.get(
+            "/stream", headers={"Accept-Encoding": encoding}, stream=True
+        )
+        raw_body = resp.raw.read(decode_content=False)
+
+        assert resp.headers["content-encoding"] == encoding
+        assert "content-length" not in resp.headers
+        assert _decompress(encoding, raw_body) == b"".join(STREAM_CHUNKS)
+
+
+class TestCompressors:
+    """Tests for the incremental compressors of every content coding."""
+
+    def test_codings_are_ordered_by_preference(self) -> None:
+        """Zstandard should be preferred over Brotli, and Brotli over gzip."""
+        factories = svc_compression.make_compressor_factories()
+
+        assert list(factories) == ENCODINGS
+
+    @pytest.mark.parametrize("encoding", ENCODINGS)
+    def test_flushed_chunks_are_decodable_before_finish(self, encoding: str) -> None:
+        """Every flushed chunk should be decodable without the stream trailer.
+
+        Given:
+            - A compressor of a content coding.
+        When:
+            - Compressing and flushing chunks, then finishing the stream.
+        Then:
+            - A streaming decoder restores every chunk right away.
+            - And the finished stream decodes to all chunks.
+
+        Args:
+            encoding: The content coding.
+        """
+        compressor = svc_compression.make_compressor_factories()[encoding]()
+        decompress = DECOMPRESSORS[encoding]()
+
+        first = compressor.compress(STREAM_CHUNKS[0]) + compressor.flush()
+        second = compressor.compress(STREAM_CHUNKS[1]) + compressor.flush()
+        trailer = compressor.finish()
+
+        assert decompress(first) == STREAM_CHUNKS[0]
+        assert decompress(second) == STREAM_CHUNKS[1]
+        assert _decompress(encoding, first + second + trailer) == b"".join(
+            STREAM_CHUNKS
+        )
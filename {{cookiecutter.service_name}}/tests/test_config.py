@@ -131,6 +131,16 @@ def valid_config_mapping(
     cfg = {
         "name": application_environment_name,
         "database_dsn": dsn,
+        "database_shard_dsns": [],
+        "database_pool": svc_cfg.DatabasePoolConfig().dict(),
+        "admin_token": None,
+        "compression": svc_cfg.CompressionConfig().dict(),
+        "deadlines": svc_cfg.DeadlinesConfig().dict(),
+        "allocation_tracking": svc_cfg.AllocationTrackingConfig().dict(),
+        "profiling": svc_cfg.ProfilingConfig().dict(),
+        "tracing": svc_cfg.TracingConfig().dict(),
+        "warmup": svc_cfg.WarmupConfig().dict(),
+        "config_reload": svc_cfg.ConfigReloadConfig().dict(),
     }
     return cfg
 
@@ -213,6 +223,62 @@ class TestConfig:
         with pytest.raises(pyd.ValidationError):
             _ = svc_cfg.Config(**config_with_unknown_field)
 
+    def test_pool_min_size_above_max_size_raises_validation_error(
+        self, valid_config_mapping: col_abc.Mapping
+    ) -> None:
+        """For a pool that cannot hold its minimum size, the constructor should
+        raise a validation error.
+
+        Given:
+            - A valid configuration mapping.
+            - And the minimum pool size exceeds the maximum pool size.
+        When:
+            - Attempting to initialize the object.
+        Then:
+            - The constructor should raise a validation error.
+
+        Args:
+            valid_config_mapping: a valid configuration mapping.
+        """
+        pool: dict[str, t.Any] = {"database_pool": {"min_size": 5, "max_size": 1}}
+        config_with_invalid_pool = valid_config_mapping | pool
+
+        with pytest.raises(pyd.ValidationError):
+            _ = svc_cfg.Config(**config_with_invalid_pool)
+
+    @pytest.mark.parametrize("enabled, valid", [(True, False), (False, True)])
+    def test_drain_shorter_than_deadlines_is_valid_only_without_reloading(
+        self, valid_config_mapping: col_abc.Mapping, enabled: bool, valid: bool
+    ) -> None:
+        """Replaced pools that close before the longest request can finish
+        should be rejected when the config is reloaded.
+
+        Given:
+            - A valid configuration mapping.
+            - And the drain timeout is shorter than the maximum deadline.
+        When:
+            - Attempting to initialize the object.
+        Then:
+            - The constructor should raise a validation error if reloading is
+              enabled.
+
+        Args:
+            valid_config_mapping: a valid configuration mapping.
+            enabled: Whether config reloading is enabled.
+            valid: Whether the config should be valid.
+        """
+        settings: dict[str, t.Any] = {
+            "deadlines": {"max_timeout": 60},
+            "config_reload": {"enabled": enabled, "drain_timeout": 30},
+        }
+        config_mapping = valid_config_mapping | settings
+
+        if valid:
+            assert svc_cfg.Config(**config_mapping)
+        else:
+            with pytest.raises(pyd.ValidationError):
+                _ = svc_cfg.Config(**config_mapping)
+
     def test_env_var_set_should_load_config_from_matching_yaml(
         self,
         monkeypatch: pytest.MonkeyPatch,
@@ -0,0 +1,468 @@
+"""Tests for request deadlines."""
+import asyncio
+import json
+import math
+import time
+import typing as t
+
+import fastapi as fa
+import fastapi.testclient as fa_tc
+import pytest
+import starlette.status as http_status
+import starlette.types as st_types
+
+import {{cookiecutter.service_name}}._deadlines as svc_deadlines
+import {{cookiecutter.service_name}}._endpoints as svc_endpoints
+import {{cookiecutter.service_name}}._repositories as repos
+import {{cookiecutter.service_name}}._sharding as svc_sharding
+import {{cookiecutter.service_name}}.main as svc_main
+import tests.conftest as conftest
+
+HEADER_NAME: t.Final[str] = "X-Request-Timeout"
+# Long enough to tell a cancelled statement from a completed one
+SLEEP_SECONDS: t.Final[int] = 5
+
+
+@pytest.fixture
+def policy() -> svc_deadlines.DeadlinePolicy:
+    """Return a deadline policy.
+
+    Returns:
+        A policy with a default timeout, a route timeout and a maximum.
+    """
+    return svc_deadlines.DeadlinePolicy(
+        default_timeout=10.0,
+        max_timeout=60.0,
+        route_timeouts={"/slow": 30.0},
+        header_name=HEADER_NAME,
+    )
+
+
+def _make_repo(db: conftest.DatabaseStub) -> repos.HealthCheckRepository:
+    """Return a healthcheck repository with a single shard.
+
+    Args:
+        db: The database of the shard.
+
+    Returns:
+        The repository.
+    """
+    return repos.HealthCheckRepository(
+        svc_sharding.ShardRouter({"test": t.cast(t.Any, db)})
+    )
+
+
+class TestDeadline:
+    """Tests for deadlines."""
+
+    def test_remaining_time_is_reported(self) -> None:
+        """A pending deadline should report the time left until it."""
+        deadline = svc_deadlines.Deadline.after(5.0)
+
+        assert 4.0 < deadline.remaining() <= 5.0
+
+    def test_expired_deadline_has_no_time_left(self) -> None:
+        """An expired deadline should report no time left."""
+        deadline = svc_deadlines.Deadline.after(-1.0)
+
+        assert deadline.remaining() == 0
+
+
+class TestDeadlinePolicy:
+    """Tests for the deadline policy."""
+
+    @pytest.mark.parametrize(
+        "route, headers, expected_timeout",
+        [
+            ("/fast", {}, 10.0),
+            ("/slow", {}, 30.0),
+            ("/slow", {HEADER_NAME: "2.5"}, 2.5),
+            ("/slow", {HEADER_NAME: "3600"}, 60.0),
+            ("/slow", {HEADER_NAME: "-1"}, 30.0),
+            ("/slow", {HEADER_NAME: "nan"}, 30.0),
+            ("/slow", {HEADER_NAME: "soon"}, 30.0),
+        ],
+    )
+    def test_deadline_for(
+        self,
+        policy: svc_deadlines.DeadlinePolicy,
+        route: str,
+        headers: dict[str, str],
+        expected_timeout: float,
+    ) -> None:
+        """Deadlines should follow valid client timeouts up to the maximum.
+
+        Given:
+            - A policy with a default timeout, a route timeout and a maximum.
+        When:
+            - Deciding the deadline of a request.
+        Then:
+            - A valid timeout of the client takes precedence over the route's.
+            - And the timeout does not exceed the maximum.
+
+        Args:
+            policy: The policy.
+            route: The route of the request.
+            headers: Headers of the request.
+            expected_timeout: The expected timeout of the request.
+        """
+        deadline = policy.deadline_for(headers, route)
+
+        assert math.isclose(deadline.remaining(), expected_timeout, abs_tol=0.5)
+
+
+class TestWaitFor:
+    """Tests for waiting for awaitables until a deadline."""
+
+    def test_result_is_returned_without_deadline(self) -> None:
+        """Awaitables should be waited for indefinitely without a deadline."""
+        assert asyncio.run(svc_deadlines.wait_for(asyncio.sleep(0, "done"), None))
+
+    def test_slow_awaitable_exceeds_deadline(self) -> None:
+        """Awaitables that outlive the deadline should be cancelled."""
+        deadline = svc_deadlines.Deadline.after(0.01)
+
+        with pytest.raises(svc_deadlines.DeadlineExceededError):
+            asyncio.run(svc_deadlines.wait_for(asyncio.sleep(1), deadline))
+
+
+class TestStatementDeadline:
+    """Tests for deadlines of repository statements."""
+
+    @pytest.mark.parametrize("timeout", [2.0, None])
+    def test_statement_takes_single_round_trip(
+        self, timeout: t.Optional[float]
+    ) -> None:
+        """Deadlines should not add statements to the ones a repository runs.
+
+        Args:
+            timeout: Seconds until the deadline, `None` for no deadline.
+        """
+        db = conftest.DatabaseStub()
+        repo = _make_repo(db)
+        deadline = None if timeout is None else svc_deadlines.Deadline.after(timeout)
+
+        asyncio.run(repo.create(deadline=deadline))
+
+        assert len(db.fetched) == 1
+
+    def test_statement_past_deadline_is_cancelled(self) -> None:
+        """Statements that outlive the deadline should be cancelled.
+
+        Given:
+            - A repository whose statements are slow.
+        When:
+            - Creating a healthcheck with a deadline.
+        Then:
+            - The deadline is exceeded.
+            - And the statement is cancelled, which asyncpg passes on to the
+              server.
+        """
+        db = conftest.DatabaseStub(delay=1.0)
+        repo = _make_repo(db)
+
+        with pytest.raises(svc_deadlines.DeadlineExceededError):
+            asyncio.run(repo.create(deadline=svc_deadlines.Deadline.after(0.01)))
+
+        assert db.cancelled
+
+
+class TestCancelOnDisconnectMiddleware:
+    """Tests for cancelling requests whose clients disconnected."""
+
+    @staticmethod
+    def _make_receive(delay: float) -> st_types.Receive:
+        """Return a receiver of a client that disconnects after a delay.
+
+        Args:
+            delay: Seconds until the client disconnects.
+
+        Returns:
+            The receiver.
+        """
+        messages: list[st_types.Message] = [
+            {"type": "http.request", "body": b"", "more_body": False},
+            {"type": "http.disconnect"},
+        ]
+
+        async def receive() -> st_types.Message:
+            message = messages.pop(0)
+            if message["type"] == "http.disconnect":
+                await asyncio.sleep(delay)
+            return message
+
+        return receive
+
+    def test_disconnect_cancels_request(self) -> None:
+        """A request should be cancelled once its client disconnects.
+
+        Given:
+            - An app that takes long to respond.
+        When:
+            - The client disconnects before the response is sent.
+        Then:
+            - The request is cancelled.
+            - And the middleware finishes without errors.
+        """
+        cancelled = False
+
+        async def slow_app(
+            scope: st_types.Scope, receive: st_types.Receive, send: st_types.Send
+        ) -> None:
+            nonlocal cancelled
+            await receive()
+            try:
+                await asyncio.sleep(1)
+            except asyncio.CancelledError:
+                cancelled = True
+                raise
+
+        middleware = svc_deadlines.CancelOnDisconnectMiddleware(slow_app)
+
+        async def send(message: st_types.Message) -> None:
+            raise AssertionError("Nothing should be sent")
+
+        asyncio.run(
+            asyncio.wait_for(
+                middleware({"type": "http"}, self._make_receive(0.01), send), 0.5
+            )
+        )
+
+        assert cancelled
+
+    def test_disconnect_after_response_does_not_cancel(self) -> None:
+        """Work that follows a sent response should not be cancelled.
+
+        Given:
+            - An app that runs a background task after responding.
+        When:
+            - The client disconnects once the response is sent.
+        Then:
+            - The background task completes.
+        """
+        sent: list[st_types.Message] = []
+        completed = False
+
+        async def app(
+            scope: st_types.Scope, receive: st_types.Receive, send: st_types.Send
+        ) -> None:
+            nonlocal completed
+            await send({"type": "http.response.start", "status": 200})
+            await send({"type": "http.response.body", "body": b"ok"})
+            await asyncio.sleep(0.05)
+            completed = True
+
+        async def send(message: st_types.Message) -> None:
+            sent.append(message)
+
+        middleware = svc_deadlines.CancelOnDisconnectMiddleware(app)
+        asyncio.run(middleware({"type": "http"}, self._make_receive(0), send))
+
+        assert completed
+        assert len(sent) == 2
+
+    def test_request_body_is_received_as_fast_as_it_is_read(self) -> None:
+        """The middleware should not receive a request body ahead of the app.
+
+        Given:
+            - A client that sends its body in many chunks.
+        When:
+            - An app reads a single chunk and then waits for events.
+            - And the client disconnects.
+        Then:
+            - Only a bounded number of chunks is received from the client.
+            - And the app learns about the disconnect.
+        """
+        chunks = 100
+        received = 0
+
+        async def receive() -> st_types.Message:
+            nonlocal received
+            received += 1
+            if received > chunks:
+                return {"type": "http.disconnect"}
+            return {"type": "http.request", "body": b"x", "more_body": True}
+
+        app_events: list[st_types.Message] = []
+
+        async def app(
+            scope: st_types.Scope, receive: st_types.Receive, send: st_types.Send
+        ) -> None:
+            app_events.append(await receive())
+            await asyncio.sleep(0.05)
+            received_while_reading = received
+            await send({"type": "http.response.start", "status": 200})
+            await send({"type": "http.response.body", "body": b"ok"})
+            app_events.append({"received": received_while_reading})
+
+        async def send(message: st_types.Message) -> None:
+            """Discard sent events.
+
+            Args:
+                message: The event.
+            """
+
+        middleware = svc_deadlines.CancelOnDisconnectMiddleware(app)
+        asyncio.run(middleware({"type": "http"}, receive, send))
+
+        first_event, progress = app_events
+        assert first_event["type"] == "http.request"
+        assert progress["received"] <= 3
+
+    def test_app_receives_disconnect(self) -> None:
+        """An app that waits for events should learn about the disconnect.
+
+        Given:
+            - An app that reads the request and then waits for the next event.
+        When:
+            - The client disconnects after the response is sent.
+        Then:
+            - The app receives the disconnect.
+        """
+        app_events: list[st_types.Message] = []
+
+        async def app(
+            scope: st_types.Scope, receive: st_types.Receive, send: st_types.Send
+        ) -> None:
+            app_events.append(await receive())
+            await send({"type": "http.response.start", "status": 200})
+            await send({"type": "http.response.body", "body": b"ok"})
+            app_events.append(await receive())
+            app_events.append(await receive())
+
+        async def send(message: st_types.Message) -> None:
+            """Discard sent events.
+
+            Args:
+                message: The event.
+            """
+
+        middleware = svc_deadlines.CancelOnDisconnectMiddleware(app)
+        asyncio.run(middleware({"type": "http"}, self._make_receive(0.01), send))
+
+        assert [event["type"] for event in app_events] == [
+            "http.request",
+            "http.disconnect",
+            "http.disconnect",
+        ]
+
+    def test_other_connections_are_passed_through(self) -> None:
+        """Connections other than HTTP requests should reach the app as is."""
+        received: list[st_types.Receive] = []
+
+        async def app(
+            scope: st_types.Scope, receive: st_types.Receive, send: st_types.Send
+        ) -> None:
+            received.append(receive)
+
+        async def receive() -> st_types.Message:
+            return {"type": "lifespan.startup"}
+
+        async def send(message: st_types.Message) -> None:
+            """Discard sent events.
+
+            Args:
+                message: The event.
+            """
+
+        middleware = svc_deadlines.CancelOnDisconnectMiddleware(app)
+        asyncio.run(middleware({"type": "lifespan"}, receive, send))
+
+        assert received == [receive]
+
+    def test_other_cancellations_propagate(self) -> None:
+        """Cancellations that are not caused by a disconnect should propagate."""
+
+        async def cancelled_app(
+            scope: st_types.Scope, receive: st_types.Receive, send: st_types.Send
+        ) -> None:
+            raise asyncio.CancelledError
+
+        async def send(message: st_types.Message) -> None:
+            """Discard sent events.
+
+            Args:
+                message: The event.
+            """
+
+        middleware = svc_deadlines.CancelOnDisconnectMiddleware(cancelled_app)
+
+        with pytest.raises(asyncio.CancelledError):
+            asyncio.run(middleware({"type": "http"}, self._make_receive(1), send))
+
+    @pytest.mark.parametrize("enabled", [True, False])
+    def test_middleware_is_added_only_when_enabled(
+        self, monkeypatch: pytest.MonkeyPatch, enabled: bool
+    ) -> None:
+        """The middleware should wrap the application only if enabled.
+
+        Args:
+            monkeypatch: The monkeypatcher.
+            enabled: Whether cancelling on disconnect is enabled.
+        """
+        monkeypatch.setenv("DEADLINES", json.dumps({"cancel_on_disconnect": enabled}))
+
+        app = svc_main._create_app()
+        middleware_classes = [middleware.cls for middleware in app.user_middleware]
+
+        assert (
+            svc_deadlines.CancelOnDisconnectMiddleware in middleware_classes
+        ) is enabled
+
+
+class TestDeadlineEndpoints:
+    """Tests for deadlines of endpoints."""
+
+    def test_exceeded_deadline_times_out(self, test_client: fa_tc.TestClient) -> None:
+        """Requests that exceed their deadline should time out.
+
+        Args:
+            test_client: The test client.
+        """
+        resp = test_client.get("/health", headers={HEADER_NAME: "0"})
+
+        assert resp.status_code == http_status.HTTP_504_GATEWAY_TIMEOUT
+        assert resp.json() == {"detail": "Request deadline exceeded"}
+
+    def test_exceeded_deadline_cancels_statement_on_server(
+        self, test_client: fa_tc.TestClient
+    ) -> None:
+        """Statements of requests that time out should stop running on the server.
+
+        Given:
+            - A route that runs a statement for longer than its deadline.
+        When:
+            - Requesting the route with a short timeout.
+            - And then requesting the healthcheck endpoint.
+        Then:
+            - The first request times out.
+            - And the healthcheck responds without waiting for the statement,
+              although the test database runs both over a single connection.
+
+        Args:
+            test_client: The test client.
+        """
+        app = t.cast(svc_main.Application, test_client.app)
+        db = app.container.db()
+
+        async def sleep_in_savepoint() -> None:
+            # The test database runs everything in a single transaction, which
+            # a cancelled statement would abort without a savepoint
+            async with db.transaction():
+                await db.execute(f"SELECT pg_sleep({SLEEP_SECONDS})")
+
+        @app.get("/sleep")
+        async def sleep(
+            deadline: svc_deadlines.Deadline = fa.Depends(  # noqa: B008
+                svc_endpoints.get_request_deadline
+            ),
+        ) -> None:
+            await svc_deadlines.wait_for(sleep_in_savepoint(), deadline)
+
+        started_at = time.monotonic()
+        timed_out_resp = test_client.get("/sleep", headers={HEADER_NAME: "0.2"})
+        health_resp = test_client.get("/health/")
+
+        assert timed_out_resp.status_code == http_status.HTTP_504_GATEWAY_TIMEOUT
+        assert health_resp.status_code == http_status.HTTP_200_OK
+        assert time.monotonic() - started_at < SLEEP_SECONDS
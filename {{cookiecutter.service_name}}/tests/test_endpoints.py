@@ -1,10 +1,16 @@
 """Tests for the service's endpoints."""
+import time
+import typing as t
 import uuid
 
 import fastapi.testclient as fa_tc
 import pytest
 import starlette.status as http_status
 
+import {{cookiecutter.service_name}}.main as svc_main
+
+ADMIN_TOKEN: t.Final[str] = "an-admin-token"
+
 
 class TestHealth:
     """Tests for the health check endpoint.
@@ -37,3 +43,162 @@ class TestHealth:
         assert health_resp.status_code == http_status.HTTP_200_OK
         assert health_resp_json["status"] == "ok"
         assert uuid.UUID(health_resp_json["id"])
+
+
+class TestAdminEndpointsDisabled:
+    """Tests for admin endpoints when the admin token is not configured."""
+
+    def test_admin_endpoints_are_hidden(self, test_client: fa_tc.TestClient) -> None:
+        """Admin endpoints should not be found when they are disabled.
+
+        Args:
+            test_client: The test client.
+        """
+        resp = test_client.get(
+            "/admin/allocations", headers={"X-Admin-Token": ADMIN_TOKEN}
+        )
+
+        assert resp.status_code == http_status.HTTP_404_NOT_FOUND
+
+
+class TestAllocations:
+    """Tests for the allocation tracking admin endpoint."""
+
+    @pytest.fixture(autouse=True)
+    def enable_allocation_tracking(self, monkeypatch: pytest.MonkeyPatch) -> None:
+        """Enable admin endpoints and track allocations of every request.
+
+        Args:
+            monkeypatch: The monkeypatcher.
+        """
+        monkeypatch.setenv("ADMIN_TOKEN", ADMIN_TOKEN)
+        monkeypatch.setenv(
+            "ALLOCATION_TRACKING", '{"enabled": true, "sample_rate": 1.0}'
+        )
+
+    @pytest.mark.parametrize("headers", [{}, {"X-Admin-Token": "a-wrong-token"}])
+    def test_requests_without_valid_token_are_forbidden(
+        self, test_client: fa_tc.TestClient, headers: dict[str, str]
+    ) -> None:
+        """Admin endpoints should reject requests without a valid admin token.
+
+        Args:
+            test_client: The test client.
+            headers: Request headers.
+        """
+        resp = test_client.get("/admin/allocations", headers=headers)
+
+        assert resp.status_code == http_status.HTTP_403_FORBIDDEN
+
+    def test_allocations_of_sampled_routes_are_listed(
+        self, test_client: fa_tc.TestClient
+    ) -> None:
+        """Should list allocations of the routes that were requested.
+
+        Given:
+            - Allocations of every request are tracked.
+        When:
+            - Requesting the healthcheck endpoint.
+            - And requesting allocations with the admin token.
+        Then:
+            - The healthcheck route is listed with its allocation sites.
+
+        Args:
+            test_client: The test client.
+        """
+        test_client.get("/health/")
+
+        resp = test_client.get(
+            "/admin/allocations", headers={"X-Admin-Token": ADMIN_TOKEN}
+        )
+        allocations = {item["route"]: item for item in resp.json()}
+
+        assert resp.status_code == http_status.HTTP_200_OK
+        assert allocations["/health/"]["sampled_requests"] == 1
+        assert allocations["/health/"]["peak_bytes"] > 0
+
+
+class TestProfiling:
+    """Tests for the profiling admin endpoints."""
+
+    @pytest.fixture(autouse=True)
+    def enable_admin_endpoints(self, monkeypatch: pytest.MonkeyPatch) -> None:
+        """Enable admin endpoints.
+
+        Args:
+            monkeypatch: The monkeypatcher.
+        """
+        monkeypatch.setenv("ADMIN_TOKEN", ADMIN_TOKEN)
+
+    @pytest.fixture
+    def enable_profiling(self, monkeypatch: pytest.MonkeyPatch) -> None:
+        """Enable the sampling profiler.
+
+        Args:
+            monkeypatch: The monkeypatcher.
+        """
+        monkeypatch.setenv("PROFILING", '{"enabled": true, "sample_interval": 0.001}')
+
+    @pytest.mark.usefixtures("enable_profiling")
+    def test_profile_of_window_is_returned(self, test_client: fa_tc.TestClient) -> None:
+        """Requests should be profiled once a profiling window is opened.
+
+        Given:
+            - The profiler is enabled.
+            - And a route that keeps the CPU busy.
+        When:
+            - Opening a profiling window for every request.
+            - And requesting the busy route.
+            - And requesting the profile of the route, clearing it afterwards.
+        Then:
+            - Stacks of the route are returned in the collapsed format.
+            - And the cleared profile is empty.
+
+        Args:
+            test_client: The test client.
+        """
+        app = t.cast(svc_main.Application, test_client.app)
+
+        @app.get("/busy")
+        async def busy() -> None:
+            started_at = time.process_time()
+            while time.process_time() - started_at < 0.05:
+                pass
+
+        headers = {"X-Admin-Token": ADMIN_TOKEN}
+        window = {"duration": 60.0, "sample_rate": 1.0}
+
+        window_resp = test_client.post("/admin/profile", json=window, headers=headers)
+        test_client.get("/busy")
+        profile_resp = test_client.get(
+            "/admin/profile", params={"route": "/busy", "clear": True}, headers=headers
+        )
+        cleared_profile_resp = test_client.get(
+            "/admin/profile", params={"route": "/busy"}, headers=headers
+        )
+
+        assert window_resp.status_code == http_status.HTTP_200_OK
+        assert window_resp.json() == window
+        assert profile_resp.status_code == http_status.HTTP_200_OK
+        assert profile_resp.headers["Content-Type"].startswith("text/plain")
+        stacks = profile_resp.text.splitlines()
+        assert stacks
+        assert all(stack.startswith("/busy;") for stack in stacks)
+        assert any(f";busy ({__name__})" in stack for stack in stacks)
+        assert not cleared_profile_resp.text
+
+    def test_window_cannot_be_opened_when_disabled(
+        self, test_client: fa_tc.TestClient
+    ) -> None:
+        """Profiling windows should not be opened if the profiler is disabled.
+
+        Args:
+            test_client: The test client.
+        """
+        resp = test_client.post(
+            "/admin/profile",
+            json={"duration": 60.0, "sample_rate": 1.0},
+            headers={"X-Admin-Token": ADMIN_TOKEN},
+        )
+
+        assert resp.status_code == http_status.HTTP_409_CONFLICT
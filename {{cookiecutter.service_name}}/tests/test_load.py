@@ -0,0 +1,211 @@
+"""Tests for summarizing load test results and comparing them with a baseline."""
+import pathlib
+import runpy
+import types
+import typing as t
+
+import orjson
+import pytest
+
+LOAD_SCRIPT_PATH: t.Final[pathlib.Path] = (
+    pathlib.Path(__file__).parents[1] / "benchmarks" / "load.py"
+)
+BASELINE: t.Final[dict[str, float]] = {
+    "error_rate": 0.01,
+    "throughput_rps": 1000.0,
+    "p50_ms": 2.0,
+    "p95_ms": 5.0,
+    "p99_ms": 10.0,
+    "max_ms": 20.0,
+}
+RUN: t.Final[dict[str, t.Any]] = {
+    "target": "asgi",
+    "path": "/health/",
+    "load": {"concurrency": 10},
+    "requests": 1000,
+}
+
+
+@pytest.fixture(scope="module")
+def load() -> t.Any:
+    """Return the definitions of the load test script.
+
+    Benchmarks are scripts rather than a package, so the script is run by its
+    path.
+
+    Returns:
+        The definitions, as attributes.
+    """
+    return types.SimpleNamespace(**runpy.run_path(str(LOAD_SCRIPT_PATH)))
+
+
+class TestSummary:
+    """Tests for summarizing outcomes of requests."""
+
+    def test_results_are_summarized(self, load: t.Any) -> None:
+        """Latency percentiles, throughput and errors should be reported.
+
+        Given:
+            - 100 requests with latencies of 1 to 100 ms, two of them failed.
+        When:
+            - Summarizing them, sent over two seconds.
+        Then:
+            - Percentiles are interpolated between the latencies.
+            - And the throughput and error rate count all requests.
+
+        Args:
+            load: The load test script.
+        """
+        samples = [
+            load._Sample(latency=ms / 1e3, failed=ms in {10, 20})
+            for ms in range(100, 0, -1)
+        ]
+
+        summary = load._summarize(samples, duration=2.0)
+
+        assert summary == {
+            "requests": 100,
+            "errors": 2,
+            "error_rate": 0.02,
+            "throughput_rps": 50.0,
+            "p50_ms": 50.5,
+            "p95_ms": 95.05,
+            "p99_ms": 99.01,
+            "max_ms": 100.0,
+        }
+
+
+class TestRegressions:
+    """Tests for comparing results with a baseline."""
+
+    def test_results_within_margin_do_not_regress(self, load: t.Any) -> None:
+        """Results worse than the baseline only within the margin should pass.
+
+        The maximum latency is not compared at all, as it is a single sample.
+
+        Args:
+            load: The load test script.
+        """
+        results = {
+            "error_rate": 0.011,
+            "throughput_rps": 900.0,
+            "p50_ms": 2.2,
+            "p95_ms": 5.5,
+            "p99_ms": 11.0,
+            "max_ms": 1000.0,
+        }
+
+        assert not load._find_regressions(results, BASELINE, 0.1)
+
+    @pytest.mark.parametrize(
+        "metric, value, limit",
+        [
+            ("p50_ms", 2.21, "up to 2.2"),
+            ("p95_ms", 5.51, "up to 5.5"),
+            ("p99_ms", 11.01, "up to 11"),
+            ("error_rate", 0.012, "up to 0.011"),
+            ("throughput_rps", 899.9, "down to 900"),
+        ],
+    )
+    def test_results_past_margin_regress(
+        self, load: t.Any, metric: str, value: float, limit: str
+    ) -> None:
+        """Results worse than the baseline past the margin should regress.
+
+        Latencies and errors regress when they grow, throughput regresses
+        when it drops.
+
+        Args:
+            load: The load test script.
+            metric: The regressed result.
+            value: The value of the regressed result.
+            limit: How the baseline limits the result.
+        """
+        results = BASELINE | {metric: value}
+
+        (regression,) = load._find_regressions(results, BASELINE, 0.1)
+
+        assert regression == f"{metric} is {value}, the baseline allows {limit}"
+
+    def test_any_error_regresses_baseline_without_errors(self, load: t.Any) -> None:
+        """A baseline without errors should not allow errors at any margin.
+
+        Args:
+            load: The load test script.
+        """
+        baseline = BASELINE | {"error_rate": 0.0}
+
+        assert not load._find_regressions(baseline, baseline, 0.5)
+        assert load._find_regressions(
+            baseline | {"error_rate": 0.001}, baseline, 0.5
+        ) == ["error_rate is 0.001, the baseline allows up to 0"]
+
+    def test_results_missing_from_baseline_are_not_compared(self, load: t.Any) -> None:
+        """Results that an older baseline lacks should not fail the comparison.
+
+        Args:
+            load: The load test script.
+        """
+        baseline = {
+            metric: value
+            for metric, value in BASELINE.items()
+            if metric not in {"p99_ms", "throughput_rps"}
+        }
+        results = BASELINE | {"p99_ms": 1000.0, "throughput_rps": 1.0}
+
+        assert not load._find_regressions(results, baseline, 0.1)
+
+
+class TestBaselineSettings:
+    """Tests for comparing only runs with the settings of the baseline."""
+
+    def test_same_settings_match(self, load: t.Any) -> None:
+        """A run with the settings of the baseline should be compared with it.
+
+        Args:
+            load: The load test script.
+        """
+        assert not load._find_mismatches(RUN, RUN | BASELINE)
+
+    @pytest.mark.parametrize(
+        "argv, mismatch",
+        [
+            (["--path", "/other/"], "path is '/other/', the baseline has '/health/'"),
+            (["--url", "http://app"], "target is 'http://app', the baseline has"),
+            (["--rate", "100"], "load is {'rate': 100.0}, the baseline has"),
+            (["--requests", "10"], "requests is 10, the baseline has 1000"),
+        ],
+    )
+    def test_other_settings_are_not_compared(
+        self,
+        load: t.Any,
+        tmp_path: pathlib.Path,
+        capsys: pytest.CaptureFixture[str],
+        argv: list[str],
+        mismatch: str,
+    ) -> None:
+        """A run with other settings than the baseline should fail to start.
+
+        Given:
+            - A baseline measured with the default settings.
+        When:
+            - Running the load test with a different setting.
+        Then:
+            - The command fails before sending requests.
+            - And it reports the setting that differs.
+
+        Args:
+            load: The load test script.
+            tmp_path: A temporary directory.
+            capsys: The output capturer.
+            argv: Command line arguments of the run.
+            mismatch: The reported difference.
+        """
+        baseline_path = tmp_path / "baseline.json"
+        baseline_path.write_bytes(orjson.dumps(RUN | BASELINE))
+
+        with pytest.raises(SystemExit) as exc_info:
+            load.main(["--baseline", str(baseline_path), *argv])
+
+        assert exc_info.value.code == 2
+        assert mismatch in capsys.readouterr().err
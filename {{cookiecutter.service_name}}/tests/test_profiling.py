@@ -0,0 +1,270 @@
+"""Tests for the on-demand sampling profiler."""
+import collections.abc as col_abc
+import signal
+import sys
+import time
+import typing as t
+
+import fastapi as fa
+import fastapi.testclient as fa_tc
+import pydantic as pyd
+import pytest
+
+import {{cookiecutter.service_name}}._profiling as svc_profiling
+
+ADMIN_TOKEN: t.Final[str] = "an-admin-token"
+PROFILE_HEADERS: t.Final[dict[str, str]] = {
+    "X-Profile": "1",
+    "X-Admin-Token": ADMIN_TOKEN,
+}
+
+
+def _burn_cpu(seconds: float) -> None:
+    """Keep the CPU busy.
+
+    Args:
+        seconds: For how long, in seconds of process CPU time.
+    """
+    started_at = time.process_time()
+    while time.process_time() - started_at < seconds:
+        pass
+
+
+@pytest.fixture
+def profiler() -> col_abc.Generator[svc_profiling.SamplingProfiler, None, None]:
+    """Return a started profiler that samples often.
+
+    Yields:
+        A sampling profiler.
+    """
+    profiler = svc_profiling.SamplingProfiler(sample_interval=0.001)
+    profiler.start()
+    yield profiler
+    profiler.stop()
+
+
+@pytest.fixture
+def profiled_client(
+    profiler: svc_profiling.SamplingProfiler,
+) -> col_abc.Generator[fa_tc.TestClient, None, None]:
+    """Return a test client for an app that profiles requests.
+
+    Args:
+        profiler: The profiler used by the app.
+
+    Yields:
+        A test client.
+    """
+    app = fa.FastAPI()
+
+    @app.get("/busy/{item_id}")
+    async def busy(item_id: int) -> dict[str, int]:
+        _burn_cpu(0.05)
+        return {"item_id": item_id}
+
+    app.add_middleware(
+        svc_profiling.ProfilingMiddleware,
+        profiler=profiler,
+        header_name="X-Profile",
+        admin_token=lambda: pyd.SecretStr(ADMIN_TOKEN),
+    )
+    with fa_tc.TestClient(app) as test_client:
+        yield test_client
+
+
+class TestSamplingProfiler:
+    """Tests for the sampling profiler."""
+
+    def test_samples_are_collapsed_per_route(
+        self, profiler: svc_profiling.SamplingProfiler
+    ) -> None:
+        """Stacks sampled inside profiles should be reported under their routes.
+
+        Given:
+            - A started profiler.
+        When:
+            - Sampling stacks inside profiles of different routes.
+            - And sampling a stack outside of profiles.
+        Then:
+            - Stacks are rooted at their routes and counted.
+            - And the stack sampled outside of profiles is not reported.
+
+        Args:
+            profiler: A started profiler.
+        """
+        frame = sys._getframe()
+        with profiler.profile("/first"):
+            profiler._sample(signal.SIGPROF, frame)
+            profiler._sample(signal.SIGPROF, frame)
+        with profiler.profile("/second"):
+            profiler._sample(signal.SIGPROF, frame)
+        profiler._sample(signal.SIGPROF, frame)
+
+        first, second = profiler.collapsed_stacks().splitlines()
+
+        assert first.startswith("/first;")
+        assert first.endswith(f";{frame.f_code.co_name} ({__name__}) 2")
+        assert second.startswith("/second;")
+        assert second.endswith(" 1")
+        assert profiler.collapsed_stacks("/second") == f"{second}\n"
+
+    def test_clear_drops_samples(
+        self, profiler: svc_profiling.SamplingProfiler
+    ) -> None:
+        """Cleared samples should not be reported.
+
+        Args:
+            profiler: A started profiler.
+        """
+        with profiler.profile("/route"):
+            profiler._sample(signal.SIGPROF, sys._getframe())
+
+        profiler.clear()
+
+        assert not profiler.collapsed_stacks()
+
+    def test_samples_are_dropped_while_reported(
+        self, profiler: svc_profiling.SamplingProfiler
+    ) -> None:
+        """Samples taken while stacks are reported should not change them.
+
+        Args:
+            profiler: A started profiler.
+        """
+        with profiler.profile("/route"):
+            with profiler._paused_sampling():
+                profiler._sample(signal.SIGPROF, sys._getframe())
+            profiler._sample(signal.SIGPROF, sys._getframe())
+
+        (stack,) = profiler.collapsed_stacks().splitlines()
+
+        assert stack.endswith(" 1")
+
+    def test_timer_runs_while_any_profile_is_active(
+        self, profiler: svc_profiling.SamplingProfiler
+    ) -> None:
+        """The sampling timer should run only while requests are profiled.
+
+        Args:
+            profiler: A started profiler.
+        """
+        with profiler.profile("/first"):
+            with profiler.profile("/second"):
+                pass
+            timer_delay, _ = signal.getitimer(signal.ITIMER_PROF)
+            assert timer_delay > 0
+
+        assert signal.getitimer(signal.ITIMER_PROF) == (0.0, 0.0)
+
+    def test_stop_restores_signal_handler(self) -> None:
+        """Stopping the profiler should restore the previous signal handler."""
+        handler_before = signal.getsignal(signal.SIGPROF)
+        profiler = svc_profiling.SamplingProfiler(sample_interval=0.001)
+
+        profiler.start()
+        assert profiler.started
+        profiler.stop()
+        profiler.stop()
+
+        assert not profiler.started
+        assert signal.getsignal(signal.SIGPROF) == handler_before
+
+    def test_window_profiles_requests_until_it_closes(
+        self, profiler: svc_profiling.SamplingProfiler
+    ) -> None:
+        """Requests should be sampled only while a profiling window is open.
+
+        Args:
+            profiler: A started profiler.
+        """
+        assert not profiler.should_profile()
+
+        profiler.open_window(duration=60, sample_rate=1.0)
+        assert profiler.should_profile()
+
+        profiler.open_window(duration=0, sample_rate=1.0)
+        assert not profiler.should_profile()
+
+
+class TestProfilingMiddleware:
+    """Tests for the profiling middleware."""
+
+    def test_requested_profile_covers_route_code(
+        self,
+        profiled_client: fa_tc.TestClient,
+        profiler: svc_profiling.SamplingProfiler,
+    ) -> None:
+        """Requests that ask for profiling with the admin token are profiled.
+
+        Given:
+            - An app that profiles requests.
+        When:
+            - Requesting a CPU-bound route with the profiling header and the
+              admin token.
+        Then:
+            - The stacks of the route's code are sampled under its template.
+
+        Args:
+            profiled_client: A client for the profiled app.
+            profiler: The profiler used by the app.
+        """
+        profiled_client.get("/busy/1", headers=PROFILE_HEADERS)
+
+        stacks = profiler.collapsed_stacks("/busy/{item_id}")
+
+        assert f"_burn_cpu ({__name__})" in stacks
+
+    @pytest.mark.parametrize(
+        "headers",
+        [{}, {"X-Profile": "1"}, {"X-Profile": "1", "X-Admin-Token": "wrong"}],
+    )
+    def test_requests_without_admin_token_are_not_profiled(
+        self,
+        profiled_client: fa_tc.TestClient,
+        profiler: svc_profiling.SamplingProfiler,
+        headers: dict[str, str],
+    ) -> None:
+        """Only admins should be able to ask for profiling.
+
+        Args:
+            profiled_client: A client for the profiled app.
+            profiler: The profiler used by the app.
+            headers: Request headers.
+        """
+        profiled_client.get("/busy/1", headers=headers)
+
+        assert not profiler.collapsed_stacks()
+
+    def test_requests_are_profiled_while_window_is_open(
+        self,
+        profiled_client: fa_tc.TestClient,
+        profiler: svc_profiling.SamplingProfiler,
+    ) -> None:
+        """Requests should be profiled while a profiling window is open.
+
+        Args:
+            profiled_client: A client for the profiled app.
+            profiler: The profiler used by the app.
+        """
+        profiler.open_window(duration=60, sample_rate=1.0)
+
+        profiled_client.get("/busy/1")
+
+        assert profiler.collapsed_stacks("/busy/{item_id}")
+
+    def test_stopped_profiler_does_not_profile(
+        self,
+        profiled_client: fa_tc.TestClient,
+        profiler: svc_profiling.SamplingProfiler,
+    ) -> None:
+        """Requests should not be profiled once the profiler is stopped.
+
+        Args:
+            profiled_client: A client for the profiled app.
+            profiler: The profiler used by the app.
+        """
+        profiler.stop()
+
+        profiled_client.get("/busy/1", headers=PROFILE_HEADERS)
+
+        assert not profiler.collapsed_stacks()
@@ -0,0 +1,517 @@
+"""Tests for distributed tracing."""
+import collections.abc as col_abc
+import json
+import pathlib
+import time
+import typing as t
+
+import fastapi as fa
+import fastapi.testclient as fa_tc
+import pytest
+import starlette.status as http_status
+
+import {{cookiecutter.service_name}}._tracing as svc_tracing
+import {{cookiecutter.service_name}}.main as svc_main
+
+TRACE_ID: t.Final[str] = "4bf92f3577b34da6a3ce929d0e0e4736"
+PARENT_SPAN_ID: t.Final[str] = "00f067aa0ba902b7"
+SAMPLED_TRACEPARENT: t.Final[str] = f"00-{TRACE_ID}-{PARENT_SPAN_ID}-01"
+UNSAMPLED_TRACEPARENT: t.Final[str] = f"00-{TRACE_ID}-{PARENT_SPAN_ID}-00"
+
+
+@pytest.fixture
+def exporter() -> svc_tracing.InMemorySpanExporter:
+    """Return an in-memory span exporter.
+
+    Returns:
+        The exporter.
+    """
+    return svc_tracing.InMemorySpanExporter()
+
+
+@pytest.fixture
+def tracer(exporter: svc_tracing.InMemorySpanExporter) -> svc_tracing.Tracer:
+    """Return a tracer that starts traces for no requests by itself.
+
+    Args:
+        exporter: The exporter of the tracer.
+
+    Returns:
+        The tracer.
+    """
+    return svc_tracing.Tracer(exporter=exporter, sample_rate=0.0, service_name="test")
+
+
+@pytest.fixture
+def traced_client(
+    tracer: svc_tracing.Tracer,
+) -> col_abc.Generator[fa_tc.TestClient, None, None]:
+    """Return a test client for a traced app.
+
+    Args:
+        tracer: The tracer used by the app.
+
+    Yields:
+        A test client.
+    """
+    app = fa.FastAPI()
+
+    @app.get("/items/{item_id}")
+    async def get_item(item_id: int) -> dict[str, t.Optional[str]]:
+        with svc_tracing.span("get_item", attributes={"item_id": item_id}):
+            return {"traceparent": svc_tracing.current_traceparent()}
+
+    @app.get("/unavailable")
+    async def unavailable() -> fa.Response:
+        return fa.Response(status_code=http_status.HTTP_503_SERVICE_UNAVAILABLE)
+
+    @app.get("/failing")
+    async def fail() -> None:
+        with svc_tracing.span("fail"):
+            raise ValueError("Failed")
+
+    app.add_middleware(svc_tracing.TracingMiddleware, tracer=tracer)
+    with fa_tc.TestClient(app, raise_server_exceptions=False) as test_client:
+        yield test_client
+
+
+class TestTraceparent:
+    """Tests for parsing and formatting W3C `traceparent` headers."""
+
+    def test_parsed_context_is_formatted_back(self) -> None:
+        """A valid header should survive parsing and formatting."""
+        context = svc_tracing.parse_traceparent(SAMPLED_TRACEPARENT, "vendor=value")
+
+        assert context == svc_tracing.SpanContext(
+            trace_id=TRACE_ID,
+            span_id=PARENT_SPAN_ID,
+            sampled=True,
+            trace_state="vendor=value",
+        )
+        assert svc_tracing.format_traceparent(context) == SAMPLED_TRACEPARENT
+
+    def test_future_versions_may_add_fields(self) -> None:
+        """Headers of future versions should be parsed as far as they are known."""
+        context = svc_tracing.parse_traceparent(
+            f"01-{TRACE_ID}-{PARENT_SPAN_ID}-00-extra"
+        )
+
+        assert context is not None
+        assert not context.sampled
+
+    @pytest.mark.parametrize(
+        "traceparent",
+        [
+            "",
+            "garbage",
+            f"ff-{TRACE_ID}-{PARENT_SPAN_ID}-01",
+            f"00-{TRACE_ID}-{PARENT_SPAN_ID}-01-extra",
+            f"00-{'0' * 32}-{PARENT_SPAN_ID}-01",
+            f"00-{TRACE_ID}-{'0' * 16}-01",
+            f"00-{TRACE_ID.upper()}-{PARENT_SPAN_ID}-01",
+        ],
+    )
+    def test_invalid_headers_are_ignored(self, traceparent: str) -> None:
+        """Invalid headers should not be parsed.
+
+        Args:
+            traceparent: The header value.
+        """
+        assert svc_tracing.parse_traceparent(traceparent) is None
+
+
+class TestSpan:
+    """Tests for spans outside of the middleware."""
+
+    def test_span_is_noop_without_traced_request(
+        self, exporter: svc_tracing.InMemorySpanExporter
+    ) -> None:
+        """Spans should not be started outside of traced requests.
+
+        Args:
+            exporter: The exporter of the tracer.
+        """
+        with svc_tracing.span("untraced") as span:
+            assert span is None
+            assert svc_tracing.current_span() is None
+            assert svc_tracing.current_traceparent() is None
+
+        assert not exporter.spans
+
+    def test_spans_are_converted_to_otlp(self, tracer: svc_tracing.Tracer) -> None:
+        """Spans should be converted to OTLP JSON with typed attributes.
+
+        Args:
+            tracer: The tracer.
+        """
+        parent = svc_tracing.parse_traceparent(SAMPLED_TRACEPARENT, "vendor=value")
+        span = tracer.start_server_span(
+            "GET /",
+            parent=parent,
+            attributes={"flag": True, "count": 2, "ratio": 0.5},
+        )
+        span.record_exception(ValueError("Failed"))
+        span.end()
+        span.end()
+
+        otlp_span = span.to_otlp()
+
+        assert otlp_span["traceId"] == TRACE_ID
+        assert otlp_span["parentSpanId"] == PARENT_SPAN_ID
+        assert otlp_span["traceState"] == "vendor=value"
+        assert otlp_span["kind"] == svc_tracing.SpanKind.SERVER.value
+        assert otlp_span["status"] == {
+            "code": svc_tracing.StatusCode.ERROR.value,
+            "message": "ValueError: Failed",
+        }
+        assert otlp_span["attributes"] == [
+            {"key": "flag", "value": {"boolValue": True}},
+            {"key": "count", "value": {"intValue": "2"}},
+            {"key": "ratio", "value": {"doubleValue": 0.5}},
+        ]
+        assert otlp_span["events"][0]["name"] == "exception"
+
+    def test_spans_are_exported_with_their_resource(
+        self, tracer: svc_tracing.Tracer
+    ) -> None:
+        """Export requests should describe the service on the resource of spans.
+
+        Args:
+            tracer: The tracer.
+        """
+        spans = [tracer.start_server_span(name, parent=None) for name in "ab"]
+
+        (resource_spans,) = svc_tracing.to_otlp_request(spans)["resourceSpans"]
+
+        assert resource_spans["resource"]["attributes"] == [
+            {"key": "service.name", "value": {"stringValue": "test"}}
+        ]
+        (scope_spans,) = resource_spans["scopeSpans"]
+        assert [span["name"] for span in scope_spans["spans"]] == ["a", "b"]
+
+
+class TestTracingMiddleware:
+    """Tests for the tracing middleware."""
+
+    def test_sampled_caller_is_continued(
+        self,
+        traced_client: fa_tc.TestClient,
+        exporter: svc_tracing.InMemorySpanExporter,
+    ) -> None:
+        """Requests from sampled callers should continue the caller's trace.
+
+        Given:
+            - A traced app that starts traces for no requests by itself.
+        When:
+            - Requesting a route with the trace context of a sampled caller.
+        Then:
+            - A server span of the route continues the caller's trace.
+            - And spans of the inner code are its children.
+            - And the inner code propagates its own span to callees.
+
+        Args:
+            traced_client: A client for the traced app.
+            exporter: The exporter of the tracer.
+        """
+        resp = traced_client.get(
+            "/items/1", headers={"traceparent": SAMPLED_TRACEPARENT}
+        )
+
+        inner_span, server_span = exporter.spans
+        assert server_span.name == "GET /items/{item_id}"
+        assert server_span.context.trace_id == TRACE_ID
+        assert server_span.parent_span_id == PARENT_SPAN_ID
+        assert server_span.attributes["http.status_code"] == http_status.HTTP_200_OK
+        assert inner_span.name == "get_item"
+        assert inner_span.parent_span_id == server_span.context.span_id
+        assert inner_span.attributes == {"item_id": 1}
+        assert resp.json()["traceparent"] == svc_tracing.format_traceparent(
+            inner_span.context
+        )
+
+    @pytest.mark.parametrize("headers", [{}, {"traceparent": UNSAMPLED_TRACEPARENT}])
+    def test_unsampled_requests_are_not_traced(
+        self,
+        traced_client: fa_tc.TestClient,
+        exporter: svc_tracing.InMemorySpanExporter,
+        headers: dict[str, str],
+    ) -> None:
+        """Requests that are not sampled should not produce spans.
+
+        Args:
+            traced_client: A client for the traced app.
+            exporter: The exporter of the tracer.
+            headers: Request headers.
+        """
+        traced_client.get("/items/1", headers=headers)
+
+        assert not exporter.spans
+
+    def test_unsampled_caller_is_propagated(
+        self,
+        traced_client: fa_tc.TestClient,
+        exporter: svc_tracing.InMemorySpanExporter,
+    ) -> None:
+        """The trace of an unsampled caller should be passed on to callees.
+
+        Given:
+            - A traced app that starts traces for no requests by itself.
+        When:
+            - Requesting a route with the trace context of an unsampled caller.
+        Then:
+            - No spans are recorded.
+            - And the inner code propagates the caller's context to callees,
+              without the sampled flag.
+
+        Args:
+            traced_client: A client for the traced app.
+            exporter: The exporter of the tracer.
+        """
+        resp = traced_client.get(
+            "/items/1", headers={"traceparent": UNSAMPLED_TRACEPARENT}
+        )
+
+        assert not exporter.spans
+        assert resp.json()["traceparent"] == UNSAMPLED_TRACEPARENT
+        assert svc_tracing.current_traceparent() is None
+
+    def test_untraced_request_propagates_nothing(
+        self, traced_client: fa_tc.TestClient
+    ) -> None:
+        """A request without a trace context that is not sampled should not
+        start a trace for its callees.
+
+        Args:
+            traced_client: A client for the traced app.
+        """
+        resp = traced_client.get("/items/1")
+
+        assert resp.json()["traceparent"] is None
+
+    def test_sample_rate_starts_traces(
+        self,
+        traced_client: fa_tc.TestClient,
+        tracer: svc_tracing.Tracer,
+        exporter: svc_tracing.InMemorySpanExporter,
+    ) -> None:
+        """Requests without a valid trace context should be sampled by rate.
+
+        Args:
+            traced_client: A client for the traced app.
+            tracer: The tracer used by the app.
+            exporter: The exporter of the tracer.
+        """
+        tracer._sample_rate = 1.0
+
+        traced_client.get("/items/1", headers={"traceparent": "garbage"})
+
+        _, server_span = exporter.spans
+        assert server_span.parent_span_id is None
+        assert server_span.context.trace_id != TRACE_ID
+
+    def test_failures_are_recorded(
+        self,
+        traced_client: fa_tc.TestClient,
+        exporter: svc_tracing.InMemorySpanExporter,
+    ) -> None:
+        """Failed requests should mark their spans as failed.
+
+        Args:
+            traced_client: A client for the traced app.
+            exporter: The exporter of the tracer.
+        """
+        resp = traced_client.get(
+            "/failing", headers={"traceparent": SAMPLED_TRACEPARENT}
+        )
+
+        inner_span, server_span = exporter.spans
+        assert resp.status_code == http_status.HTTP_500_INTERNAL_SERVER_ERROR
+        assert inner_span.status_code == svc_tracing.StatusCode.ERROR
+        assert server_span.status_code == svc_tracing.StatusCode.ERROR
+
+    def test_server_errors_are_recorded(
+        self,
+        traced_client: fa_tc.TestClient,
+        exporter: svc_tracing.InMemorySpanExporter,
+    ) -> None:
+        """Server error responses should mark server spans as failed.
+
+        Args:
+            traced_client: A client for the traced app.
+            exporter: The exporter of the tracer.
+        """
+        traced_client.get("/unavailable", headers={"traceparent": SAMPLED_TRACEPARENT})
+
+        (server_span,) = exporter.spans
+        assert server_span.status_code == svc_tracing.StatusCode.ERROR
+
+
+class TestExporters:
+    """Tests for span exporters."""
+
+    @staticmethod
+    def _read_span_names(path: pathlib.Path) -> list[str]:
+        """Return names of the spans in a file of OTLP JSON export requests.
+
+        Args:
+            path: The file.
+
+        Returns:
+            Names of the spans, in the order they were written.
+        """
+        return [
+            span["name"]
+            for line in path.read_text().splitlines()
+            for resource_spans in json.loads(line)["resourceSpans"]
+            for scope_spans in resource_spans["scopeSpans"]
+            for span in scope_spans["spans"]
+        ]
+
+    def test_file_exporter_appends_export_requests(
+        self, tmp_path: pathlib.Path, tracer: svc_tracing.Tracer
+    ) -> None:
+        """Spans should be appended to the file once the exporter shuts down.
+
+        Args:
+            tmp_path: A temporary directory.
+            tracer: A tracer that creates spans.
+        """
+        path = tmp_path / "spans.jsonl"
+        exporter = svc_tracing.FileSpanExporter(path, max_queued_spans=4)
+        spans = [tracer.start_server_span(name, parent=None) for name in "abc"]
+
+        exporter.export(spans[:1])
+        exporter.export(spans[1:])
+        exporter.shutdown()
+        exporter.shutdown()
+        exporter.export(spans)
+
+        assert self._read_span_names(path) == ["a", "b", "c"]
+
+    def test_file_exporter_flushes_periodically(
+        self, tmp_path: pathlib.Path, tracer: svc_tracing.Tracer
+    ) -> None:
+        """Spans should be written after the flush interval without a shutdown.
+
+        Args:
+            tmp_path: A temporary directory.
+            tracer: A tracer that creates spans.
+        """
+        path = tmp_path / "spans.jsonl"
+        exporter = svc_tracing.FileSpanExporter(path, flush_interval=0.01)
+
+        exporter.export([tracer.start_server_span("a", parent=None)])
+        waited_until = time.monotonic() + 5.0
+        while time.monotonic() < waited_until and not (
+            path.exists() and path.read_text()
+        ):
+            time.sleep(0.01)
+
+        try:
+            assert self._read_span_names(path) == ["a"]
+        finally:
+            exporter.shutdown()
+
+    def test_file_exporter_drops_spans_past_queue_limit(
+        self,
+        tmp_path: pathlib.Path,
+        tracer: svc_tracing.Tracer,
+        caplog: pytest.LogCaptureFixture,
+    ) -> None:
+        """Spans that do not fit into the queue should be dropped and reported.
+
+        Args:
+            tmp_path: A temporary directory.
+            tracer: A tracer that creates spans.
+            caplog: The log capturer.
+        """
+        path = tmp_path / "spans.jsonl"
+        exporter = svc_tracing.FileSpanExporter(
+            path, max_queued_spans=2, flush_interval=60.0
+        )
+        spans = [tracer.start_server_span(name, parent=None) for name in "abc"]
+
+        with exporter._condition:
+            # Holding the lock keeps the writer from emptying the queue
+            exporter.export(spans)
+        exporter.shutdown()
+
+        assert self._read_span_names(path) == ["a", "b"]
+        assert "Dropped 1 spans" in caplog.text
+
+    def test_in_memory_exporter_keeps_latest_spans(
+        self, tracer: svc_tracing.Tracer
+    ) -> None:
+        """The in-memory exporter should drop the oldest spans past its limit.
+
+        Args:
+            tracer: A tracer that creates spans.
+        """
+        exporter = svc_tracing.InMemorySpanExporter(max_spans=2)
+
+        exporter.export([tracer.start_server_span(name, parent=None) for name in "abc"])
+
+        assert [span.name for span in exporter.spans] == ["b", "c"]
+
+    def test_in_memory_exporter_drops_spans_on_shutdown(
+        self, tracer: svc_tracing.Tracer, exporter: svc_tracing.InMemorySpanExporter
+    ) -> None:
+        """Shutting the in-memory exporter down should drop its spans.
+
+        Args:
+            tracer: The tracer.
+            exporter: The exporter of the tracer.
+        """
+        tracer.start_server_span("a", parent=None).end()
+
+        tracer.shutdown()
+
+        assert not exporter.spans
+
+
+class TestTracedApplication:
+    """Tests for tracing the application."""
+
+    @pytest.fixture(autouse=True)
+    def enable_tracing(self, monkeypatch: pytest.MonkeyPatch) -> None:
+        """Trace every request in memory.
+
+        Args:
+            monkeypatch: The monkeypatcher.
+        """
+        monkeypatch.setenv(
+            "TRACING",
+            json.dumps({"enabled": True, "sample_rate": 1.0, "exporter": "in_memory"}),
+        )
+
+    def test_layers_are_traced(self, test_client: fa_tc.TestClient) -> None:
+        """Every layer that handles a request should have its own span.
+
+        Given:
+            - Every request is traced.
+        When:
+            - Requesting the healthcheck endpoint.
+        Then:
+            - The endpoint, service, repository and database statements have
+              spans, nested in the order the layers are called.
+
+        Args:
+            test_client: The test client.
+        """
+        test_client.get("/health/")
+
+        app = t.cast(svc_main.Application, test_client.app)
+        spans = {span.name: span for span in app.container.span_exporter().spans}
+        parent_names = {
+            "return_health": "GET /health/",
+            "HealthService.get_healthcheck": "return_health",
+            "HealthCheckRepository.create": "HealthService.get_healthcheck",
+            "INSERT healthchecks": "HealthCheckRepository.create",
+        }
+        for name, parent_name in parent_names.items():
+            parent_span_id = spans[parent_name].context.span_id
+            assert spans[name].parent_span_id == parent_span_id
+        assert spans["INSERT healthchecks"].kind == svc_tracing.SpanKind.CLIENT
+        assert "INSERT INTO healthchecks" in str(
+            spans["INSERT healthchecks"].attributes["db.statement"]
+        )
@@ -0,0 +1,226 @@
+"""Tests for warming the application up before it accepts traffic."""
+import asyncio
+import json
+import logging
+import typing as t
+
+import fastapi as fa
+import pytest
+
+import {{cookiecutter.service_name}}._warmup as svc_warmup
+import {{cookiecutter.service_name}}.main as svc_main
+import tests.conftest as conftest
+
+STATEMENTS: t.Final[list[tuple[t.Any, t.Optional[dict[str, t.Any]]]]] = [
+    ("SELECT 1", None),
+    ("SELECT :value", {"value": 2}),
+]
+
+
+def _make_warmup(
+    *dbs: conftest.DatabaseStub, app: t.Optional[fa.FastAPI] = None, **overrides: t.Any
+) -> svc_warmup.Warmup:
+    """Return a warm-up of two connections per database.
+
+    Args:
+        dbs: The databases to warm up.
+        app: The app to send warm-up requests to.
+        overrides: Arguments that override the defaults.
+
+    Returns:
+        The warm-up.
+    """
+    arguments: dict[str, t.Any] = {
+        "statements": STATEMENTS,
+        "connections": 2,
+        "requests": [],
+        "timeout": 1.0,
+    }
+    return svc_warmup.Warmup(
+        dbs=t.cast(t.Any, dbs), app=app or fa.FastAPI(), **(arguments | overrides)
+    )
+
+
+class TestWarmup:
+    """Tests for the warm-up."""
+
+    def test_statements_are_prepared_on_every_connection(self) -> None:
+        """Every warmed up connection should have run every statement.
+
+        Given:
+            - A database.
+        When:
+            - Warming two connections up.
+        Then:
+            - Every connection runs the statements in a rolled back
+              transaction.
+        """
+        db = conftest.DatabaseStub()
+
+        asyncio.run(_make_warmup(db).run())
+
+        assert len(db.connections) == 2
+        for connection in db.connections:
+            assert connection.statements == STATEMENTS
+            assert connection.rolled_back_transactions == 1
+
+    def test_every_shard_is_warmed(self) -> None:
+        """Connections of every database shard should be warmed up."""
+        shards = [conftest.DatabaseStub(), conftest.DatabaseStub()]
+
+        asyncio.run(_make_warmup(*shards).run())
+
+        for shard in shards:
+            assert len(shard.connections) == 2
+            assert all(connection.statements for connection in shard.connections)
+
+    def test_shared_connection_is_warmed_once(self) -> None:
+        """A connection shared between tasks should not be warmed twice."""
+        db = conftest.DatabaseStub(shared_connection=True)
+
+        asyncio.run(_make_warmup(db).run())
+
+        first, second = db.connections
+        assert len(first.statements) + len(second.statements) == len(STATEMENTS)
+
+    def test_requests_are_sent_through_app(
+        self, caplog: pytest.LogCaptureFixture
+    ) -> None:
+        """Warm-up requests should be handled by the app.
+
+        Args:
+            caplog: The log capturer.
+        """
+        app = fa.FastAPI()
+        requested_bodies = []
+
+        @app.get("/warm")
+        async def warm(request: fa.Request) -> None:
+            requested_bodies.append(await request.body())
+
+        warmup = _make_warmup(
+            conftest.DatabaseStub(), app=app, requests=["/warm", "/missing"]
+        )
+
+        with caplog.at_level(logging.INFO):
+            asyncio.run(warmup.run())
+
+        assert requested_bodies == [b""]
+        assert "Warm-up request to '/missing' returned 404" in caplog.text
+        assert "Warm-up finished" in caplog.text
+
+    def test_requests_are_rolled_back(self) -> None:
+        """Warm-up requests should run in transactions that are rolled back.
+
+        Given:
+            - An app that writes to the database.
+        When:
+            - Warming it up with a request.
+        Then:
+            - The request runs while a transaction is open.
+            - And the transaction is rolled back afterwards.
+        """
+        db = conftest.DatabaseStub()
+        app = fa.FastAPI()
+        open_connections: list[conftest.ConnectionStub] = []
+
+        @app.get("/write")
+        async def write() -> None:
+            (connection,) = db.connections[2:]
+            assert not connection.rolled_back_transactions
+            open_connections.append(connection)
+
+        asyncio.run(_make_warmup(db, app=app, requests=["/write"]).run())
+
+        (connection,) = open_connections
+        assert connection.rolled_back_transactions == 1
+
+    def test_failed_warmup_does_not_stop_startup(
+        self, caplog: pytest.LogCaptureFixture
+    ) -> None:
+        """Warm-up failures should be logged instead of being raised.
+
+        Args:
+            caplog: The log capturer.
+        """
+        app = fa.FastAPI()
+
+        @app.get("/failing")
+        async def fail() -> None:
+            raise ValueError("Failed")
+
+        warmup = _make_warmup(conftest.DatabaseStub(), app=app, requests=["/failing"])
+
+        asyncio.run(warmup.run())
+
+        assert "Warm-up failed" in caplog.text
+
+    def test_slow_warmup_is_abandoned(self, caplog: pytest.LogCaptureFixture) -> None:
+        """Warm-up should not delay the startup for longer than its timeout.
+
+        Args:
+            caplog: The log capturer.
+        """
+        app = fa.FastAPI()
+
+        @app.get("/slow")
+        async def slow() -> None:
+            await asyncio.sleep(1)
+
+        warmup = _make_warmup(
+            conftest.DatabaseStub(), app=app, requests=["/slow"], timeout=0.01
+        )
+
+        asyncio.run(warmup.run())
+
+        assert "Warm-up did not finish in 0.01 seconds" in caplog.text
+
+
+class TestWarmupSetup:
+    """Tests for enabling warm-up in the application."""
+
+    @pytest.mark.parametrize("enabled", [True, False])
+    def test_warmup_runs_only_when_enabled(
+        self, monkeypatch: pytest.MonkeyPatch, enabled: bool
+    ) -> None:
+        """Warm-up should run at startup only if enabled.
+
+        Args:
+            monkeypatch: The monkeypatcher.
+            enabled: Whether warm-up is enabled.
+        """
+        monkeypatch.setenv("WARMUP", json.dumps({"enabled": enabled}))
+
+        app = svc_main._create_app()
+        startup_handlers = [
+            getattr(handler, "__qualname__", "") for handler in app.router.on_startup
+        ]
+
+        assert startup_handlers[-1].endswith(".warm_up") is enabled
+
+    def test_warmup_uses_overridden_database(
+        self, monkeypatch: pytest.MonkeyPatch
+    ) -> None:
+        """Warm-up should warm the database that the app connects to.
+
+        Given:
+            - An app whose database is overridden after the app is created,
+              like tests do.
+        When:
+            - Running the warm-up at startup.
+        Then:
+            - Connections of the overriding database are warmed up.
+
+        Args:
+            monkeypatch: The monkeypatcher.
+        """
+        monkeypatch.setenv("WARMUP", json.dumps({"enabled": True, "requests": []}))
+        app = svc_main._create_app()
+        warm_up = app.router.on_startup[-1]
+        db = conftest.DatabaseStub()
+
+        with app.container.db.override(db):
+            asyncio.run(warm_up())
+
+        assert db.connections
+        assert all(connection.statements for connection in db.connections)